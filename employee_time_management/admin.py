@@ -11,16 +11,61 @@ from .models import (
     Overtime,
     SickDays,
     LeaveOfAbsense,
+    DeptOccupancy,
+    Holiday,
+    PayrollExport,
+    OutboxEmail,
 )
+from .calendar import touch_dept_calendars
+from .utils import staff_version_bump, touch_staff
 from django.db.models.signals import post_delete
 from django.dispatch import receiver
 
+# The related rows Staff.__str__ reads.
+STAFF_STR_FIELDS = ["user", "job_title", "dept"]
+
+
+def staff_str_fields(path):
+    """Returns the `select_related` paths for the rows Staff.__str__ reads, for a Staff reached through `path`."""
+    return [f"{path}__{field}" for field in STAFF_STR_FIELDS]
+
+
+class SelectRelatedAdmin(admin.ModelAdmin):
+    """
+    A ModelAdmin that reads the rows named in `list_select_related` together with each object on every admin page.
+
+    Django only applies `list_select_related` to the changelist. This admin also applies it to the change form, the
+    delete pages and the autocomplete results other admins request, and reads employees shown in a foreign key field
+    with the rows their names are made from, so that no page issues a query per row.
+    """
+
+    list_select_related = []
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(*self.list_select_related)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.related_model is Staff:
+            kwargs["queryset"] = Staff.objects.select_related(*STAFF_STR_FIELDS)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
 
 class DivisionAdmin(admin.ModelAdmin):
     list_display = ["name"]
     search_fields = ["name"]
 
 
+class HolidayAdmin(SelectRelatedAdmin):
+    list_display = [
+        "name",
+        "date",
+        "division",
+    ]  # Fields to display in the list view
+    search_fields = ["name"]  # Enable search by holiday name
+    list_filter = ["division"]  # Add a filter for divisions
+    list_select_related = ["division"]
+
+
 class AllowedVacationAdmin(admin.ModelAdmin):
     list_display = [
         "years_employed",
@@ -28,13 +73,26 @@ class AllowedVacationAdmin(admin.ModelAdmin):
     ]  # Fields to display in the list view
     search_fields = ["years_employed"]  # Enable search by years employed
 
+    # A change to the allowance tiers can change anyone's entitlement.
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        Staff.objects.update(**staff_version_bump())
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        Staff.objects.update(**staff_version_bump())
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        Staff.objects.update(**staff_version_bump())
+
 
 class JobTitleAdmin(admin.ModelAdmin):
     list_display = ["title"]  # Display the title field in the list view
     search_fields = ["title"]  # Enable search by title
 
 
-class DeptAdmin(admin.ModelAdmin):
+class DeptAdmin(SelectRelatedAdmin):
     list_display = [
         "name",
         "division",
@@ -46,9 +104,12 @@ class DeptAdmin(admin.ModelAdmin):
         "division__name",
     ]  # Enable search by department name and division name
     list_filter = ["division"]  # Add a filter for divisions
+    list_select_related = ["division"]
+    # Clear the calendar token to revoke the department's calendar URL.
+    readonly_fields = ["calendar_version", "calendar_modified_at"]
 
 
-class StaffAdmin(admin.ModelAdmin):
+class StaffAdmin(SelectRelatedAdmin):
     list_display = [
         "user",
         "job_title",
@@ -73,9 +134,16 @@ class StaffAdmin(admin.ModelAdmin):
         "is_manager",
         "is_owner",
     ]  # Filters for the department, job title, and roles
+    list_select_related = STAFF_STR_FIELDS
+    autocomplete_fields = ["user", "job_title", "dept"]
 
     def save_model(self, request, obj, form, change):
         super().save_model(request, obj, form, change)
+        if change and form.changed_data:
+            touch_staff([obj.pk])
+        if change and "dept" in form.changed_data:
+            # The employee's absences move from one department's calendar to the other's.
+            touch_dept_calendars([form.initial.get("dept"), obj.dept_id])
 
         # Check if the user is a manager
         if obj.is_manager:
@@ -94,7 +162,7 @@ class StaffAdmin(admin.ModelAdmin):
             Owner.objects.filter(name=obj).delete()
 
 
-class ManagerAdmin(admin.ModelAdmin):
+class ManagerAdmin(SelectRelatedAdmin):
     list_display = [
         "name",
         "dept",
@@ -109,6 +177,8 @@ class ManagerAdmin(admin.ModelAdmin):
         "approve_expense",
         "approve_any_staff",
     ]  # Filters for approval permissions
+    list_select_related = [*staff_str_fields("name"), "dept"]
+    autocomplete_fields = ["name", "dept"]
 
 
 # Define the signal handler
@@ -121,7 +191,7 @@ def uncheck_is_manager(sender, instance, **kwargs):
         staff.save()  # Save the Staff object with is_manager unchecked
 
 
-class OwnerAdmin(admin.ModelAdmin):
+class OwnerAdmin(SelectRelatedAdmin):
     list_display = [
         "name",
         "approve_expense",
@@ -132,6 +202,8 @@ class OwnerAdmin(admin.ModelAdmin):
         "approve_expense",
         "approve_any_staff",
     ]  # Filters for approval permissions
+    list_select_related = staff_str_fields("name")
+    autocomplete_fields = ["name"]
 
 
 # Define the signal handler for Owner
@@ -143,16 +215,34 @@ def uncheck_is_owner(sender, instance, **kwargs):
         staff.save()  # Save the Staff object with is_owner unchecked
 
 
-class VacationsAdmin(admin.ModelAdmin):
+class StaffRequestAdmin(SelectRelatedAdmin):
+    """
+    A ModelAdmin for vacation and overtime requests, which moves on the versions of the employees whose requests are
+    edited or deleted, as the views do.
+    """
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        touch_staff([obj.name_id, form.initial.get("name")])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        touch_staff([obj.name_id])
+
+    def delete_queryset(self, request, queryset):
+        staff_ids = list(queryset.values_list("name_id", flat=True))
+        super().delete_queryset(request, queryset)
+        touch_staff(staff_ids)
+
+
+class VacationsAdmin(StaffRequestAdmin):
     list_display = [
         "name",
         "dept",
         "start_date",
         "end_date",
         "total_hours_away",
-        "request_submitted",
-        "request_approved",
-        "request_denied",
+        "status",
         "approved_by",
     ]  # Fields to display in the list view
     search_fields = [
@@ -163,20 +253,19 @@ class VacationsAdmin(admin.ModelAdmin):
     list_filter = [
         "dept",
         "is_employee",
-        "request_approved",
-        "request_denied",
+        "status",
     ]  # Add filters for department and approval status
+    list_select_related = [*staff_str_fields("name"), "dept", "approved_by"]
+    autocomplete_fields = ["name", "dept", "approved_by"]
 
 
-class OvertimeAdmin(admin.ModelAdmin):
+class OvertimeAdmin(StaffRequestAdmin):
     list_display = [
         "name",
         "dept",
         "date",
         "ot_hours",
-        "request_submitted",
-        "request_approved",
-        "request_denied",
+        "status",
         "approved_by",
     ]  # Fields to display in the list view
     search_fields = [
@@ -186,12 +275,13 @@ class OvertimeAdmin(admin.ModelAdmin):
     ]  # Enable search by staff name, department, and manager
     list_filter = [
         "dept",
-        "request_approved",
-        "request_denied",
+        "status",
     ]  # Add filters for department and approval status
+    list_select_related = [*staff_str_fields("name"), "dept", "approved_by"]
+    autocomplete_fields = ["name", "dept", "approved_by"]
 
 
-class SickDaysAdmin(admin.ModelAdmin):
+class SickDaysAdmin(SelectRelatedAdmin):
     list_display = [
         "name",
         "date",
@@ -206,9 +296,11 @@ class SickDaysAdmin(admin.ModelAdmin):
         "approved_by__name__user__username",
     ]  # Enable search by staff name, department, and manager
     list_filter = ["dept", "approved_by"]  # Add filters for department and manager
+    list_select_related = [*staff_str_fields("name"), "dept", "approved_by"]
+    autocomplete_fields = ["name", "dept", "approved_by"]
 
 
-class LeaveOfAbsenseAdmin(admin.ModelAdmin):
+class LeaveOfAbsenseAdmin(SelectRelatedAdmin):
     list_display = [
         "name",
         "date",
@@ -227,9 +319,50 @@ class LeaveOfAbsenseAdmin(admin.ModelAdmin):
         "unpaid",
         "approved_by",
     ]  # Add filters for unpaid status and the manager who approved
+    list_select_related = [*staff_str_fields("name"), "approved_by"]
+    autocomplete_fields = ["name", "approved_by"]
+
+
+class DeptOccupancyAdmin(SelectRelatedAdmin):
+    list_display = [
+        "dept",
+        "date",
+        "on_vacation",
+        "off_sick",
+    ]  # Fields to display in the list view
+    search_fields = ["dept__name"]  # Enable search by department name
+    list_filter = ["dept"]  # Add a filter for departments
+    list_select_related = ["dept"]
+    autocomplete_fields = ["dept"]
+
+
+class PayrollExportAdmin(SelectRelatedAdmin):
+    list_display = [
+        "id",
+        "created_at",
+        "created_by",
+        "confirmed_at",
+    ]  # Fields to display in the list view
+    list_filter = ["confirmed_at"]  # Add a filter for confirmed exports
+    list_select_related = ["created_by"]
+    raw_id_fields = ["created_by"]
+
+
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = [
+        "to",
+        "subject",
+        "created_at",
+        "attempts",
+        "send_after",
+        "sent_at",
+    ]  # Fields to display in the list view
+    search_fields = ["to", "subject"]  # Enable search by recipient and subject
+    readonly_fields = ["created_at"]
 
 
 admin.site.register(Division, DivisionAdmin)
+admin.site.register(Holiday, HolidayAdmin)
 admin.site.register(Allowed_vacation, AllowedVacationAdmin)
 admin.site.register(JobTitle, JobTitleAdmin)
 admin.site.register(Dept, DeptAdmin)
@@ -240,3 +373,6 @@ admin.site.register(Vacations, VacationsAdmin)
 admin.site.register(Overtime, OvertimeAdmin)
 admin.site.register(SickDays, SickDaysAdmin)
 admin.site.register(LeaveOfAbsense, LeaveOfAbsenseAdmin)
+admin.site.register(DeptOccupancy, DeptOccupancyAdmin)
+admin.site.register(PayrollExport, PayrollExportAdmin)
+admin.site.register(OutboxEmail, OutboxEmailAdmin)
@@ -0,0 +1,149 @@
+import datetime
+import secrets
+
+from django.db.models import F, Value
+from django.utils import timezone
+
+from .models import Dept, LeaveOfAbsense, RequestStatus, SickDays, Vacations
+
+# How far back and ahead of today a department's absence calendar reaches.
+CALENDAR_PAST_DAYS = 90
+CALENDAR_FUTURE_DAYS = 365
+
+
+# A department's calendar version and modified time are the ETag and
+# Last-Modified of its absence calendar, whose cache key also includes the
+# version. The code that changes what the calendar shows moves them on itself.
+def touch_dept_calendars(dept_ids):
+    """
+    Moves the calendar version of departments on, so their cached absence calendars are rebuilt.
+
+    Parameters:
+    - dept_ids: The ids of the departments whose absences changed, as a list or a queryset.
+    """
+
+    Dept.objects.filter(pk__in=dept_ids).update(
+        calendar_version=F("calendar_version") + 1,
+        calendar_modified_at=timezone.now(),
+    )
+
+
+def dept_calendar_token(dept):
+    """
+    Returns the secret token for a department's absence calendar URL, making one if the department has none.
+
+    Parameters:
+    - dept: The department.
+
+    Returns:
+    - The token string.
+    """
+
+    if not dept.calendar_token:
+        # Only set the token if no one else has since, so two managers asking at
+        # once end up with the same URL.
+        Dept.objects.filter(pk=dept.pk, calendar_token__isnull=True).update(
+            calendar_token=secrets.token_urlsafe(24)
+        )
+        dept.refresh_from_db(fields=["calendar_token"])
+    return dept.calendar_token
+
+
+def _ical_text(value):
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def _ical_line(line):
+    # Lines longer than 75 octets are folded onto continuation lines that start
+    # with a space (RFC 5545 section 3.1), without splitting a character.
+    folded = []
+    limit = 75
+    while len(line.encode()) > limit:
+        cut = limit
+        while len(line[:cut].encode()) > limit:
+            cut -= 1
+        folded.append(line[:cut])
+        line = line[cut:]
+        limit = 74
+    folded.append(line)
+    return "\r\n ".join(folded)
+
+
+def absence_calendar(dept, today):
+    """
+    Builds an iCalendar file of a department's approved absences.
+
+    The calendar holds approved vacations, sick days and leaves of absence from `CALENDAR_PAST_DAYS` before today to
+    `CALENDAR_FUTURE_DAYS` after it, as all-day events titled with the employee's name. All three kinds are read in one
+    query, limited to that window.
+
+    Parameters:
+    - dept: The department.
+    - today: The date the window is centred on.
+
+    Returns:
+    - The calendar as a string, with CRLF line endings.
+    """
+
+    first = today - datetime.timedelta(days=CALENDAR_PAST_DAYS)
+    last = today + datetime.timedelta(days=CALENDAR_FUTURE_DAYS)
+    people = [
+        "pk",
+        "name__user__first_name",
+        "name__user__last_name",
+        "name__user__username",
+    ]
+
+    def absences(queryset, kind, start, end):
+        return (
+            queryset.filter(**{f"{start}__lte": last, f"{end}__gte": first})
+            .annotate(kind=Value(kind), start=F(start), end=F(end))
+            .values_list(*people, "kind", "start", "end")
+        )
+
+    rows = absences(
+        Vacations.objects.filter(dept=dept, status=RequestStatus.APPROVED),
+        "Vacation",
+        "start_date",
+        "end_date",
+    ).union(
+        absences(SickDays.objects.filter(dept=dept), "Sick", "date", "date"),
+        absences(
+            LeaveOfAbsense.objects.filter(name__dept=dept),
+            "Leave of absence",
+            "start_date",
+            "end_date",
+        ),
+        all=True,
+    )
+
+    stamp = dept.calendar_modified_at.astimezone(datetime.timezone.utc)
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//HRAssist//Absences//EN",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{_ical_text(dept.name)} absences",
+    ]
+    for pk, first_name, last_name, username, kind, start, end in sorted(
+        rows, key=lambda row: (row[5], row[4], row[0])
+    ):
+        name = f"{first_name} {last_name}".strip() or username
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{kind.split()[0].lower()}-{pk}@hrassist",
+            f"DTSTAMP:{stamp:%Y%m%dT%H%M%SZ}",
+            f"DTSTART;VALUE=DATE:{start:%Y%m%d}",
+            f"DTEND;VALUE=DATE:{end + datetime.timedelta(days=1):%Y%m%d}",
+            f"SUMMARY:{_ical_text(f'{name}: {kind}')}",
+            "TRANSP:TRANSPARENT",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return "".join(f"{_ical_line(line)}\r\n" for line in lines)
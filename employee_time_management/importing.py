@@ -0,0 +1,139 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import Dept, JobTitle, Staff
+from .utils import next_update_on
+
+# Columns of a staff import file. anniversary_date may be left blank for today.
+STAFF_IMPORT_COLUMNS = [
+    "username",
+    "email",
+    "first_name",
+    "last_name",
+    "dept",
+    "job_title",
+    "anniversary_date",
+]
+
+
+def _import_staff_chunk(chunk, depts, job_titles, seen, today):
+    """
+    Validates and creates one chunk of a staff import.
+
+    Returns:
+    - A (created, errors) tuple, where errors is a list of (line number, message) tuples.
+    """
+
+    User = get_user_model()
+    usernames = [row.get("username", "").strip() for _, row in chunk]
+    taken = set(
+        User.objects.filter(username__in=usernames).values_list("username", flat=True)
+    )
+    users, staff, errors = [], [], []
+    for (line, row), username in zip(chunk, usernames):
+        row = {
+            column: (row.get(column) or "").strip() for column in STAFF_IMPORT_COLUMNS
+        }
+        problems = []
+        if not username:
+            problems.append("username is required")
+        elif username in taken or username in seen:
+            problems.append(f"username {username!r} is already taken")
+        if not row["email"]:
+            problems.append("email is required")
+        dept = depts.get(row["dept"])
+        if dept is None:
+            problems.append(f"unknown department {row['dept']!r}")
+        job_title = job_titles.get(row["job_title"])
+        if job_title is None:
+            problems.append(f"unknown job title {row['job_title']!r}")
+        anniversary_date = today
+        if row["anniversary_date"]:
+            try:
+                anniversary_date = datetime.date.fromisoformat(row["anniversary_date"])
+            except ValueError:
+                problems.append("anniversary_date must be in YYYY-MM-DD format")
+        user = User(
+            username=username,
+            email=row["email"],
+            first_name=row["first_name"],
+            last_name=row["last_name"],
+        )
+        user.set_unusable_password()
+        try:
+            user.full_clean(exclude=["password"], validate_unique=False)
+        except ValidationError as e:
+            problems += [
+                f"{field}: {message}"
+                for field, messages in e.message_dict.items()
+                for message in messages
+            ]
+        if problems:
+            errors.append((line, "; ".join(problems)))
+            continue
+        seen.add(username)
+        users.append(user)
+        staff.append(
+            Staff(
+                dept=dept,
+                job_title=job_title,
+                anniversary_date=anniversary_date,
+                update_on=next_update_on(anniversary_date, today),
+                is_employee=True,
+            )
+        )
+
+    User.objects.bulk_create(users)
+    for user, member in zip(users, staff):
+        member.user = user
+    Staff.objects.bulk_create(staff)
+    return len(staff), errors
+
+
+def import_staff(rows, chunk_size=500, dry_run=False):
+    """
+    Creates employees from the rows of a staff import file.
+
+    This is the bulk form of the signup page, for onboarding a whole site at once. Each row needs the columns in
+    `STAFF_IMPORT_COLUMNS`; departments and job titles are given by name. The rows are read as they are needed, so the
+    file can be streamed, and are created `chunk_size` at a time with one `bulk_create` for the users and one for the
+    staff, all in a single transaction.
+
+    Departments and job titles are each loaded with one query. A row that fails validation, for example because its
+    username is taken or its department does not exist, is reported and skipped, and the rest of the file is still
+    imported. Like users made on the signup page, imported users have no password until they set one through the
+    password reset page.
+
+    Parameters:
+    - rows: An iterable of (line number, dict) tuples, e.g. from `enumerate(csv.DictReader(file), start=2)`.
+    - chunk_size: How many rows to create at a time.
+    - dry_run: If True, the rows are validated but nothing is saved.
+
+    Returns:
+    - A (created, errors) tuple: the number of employees created (or that would be created, on a dry run), and a list
+      of (line number, message) tuples for the rows that were skipped.
+    """
+
+    today = datetime.date.today()
+    created, errors = 0, []
+    with transaction.atomic():
+        depts = {dept.name: dept for dept in Dept.objects.all()}
+        job_titles = {title.title: title for title in JobTitle.objects.all()}
+        seen = set()
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                done, failed = _import_staff_chunk(
+                    chunk, depts, job_titles, seen, today
+                )
+                created, errors, chunk = created + done, errors + failed, []
+        if chunk:
+            done, failed = _import_staff_chunk(chunk, depts, job_titles, seen, today)
+            created, errors = created + done, errors + failed
+        if dry_run:
+            transaction.set_rollback(True)
+    return created, errors
@@ -0,0 +1,228 @@
+import datetime
+import json
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from employee_time_management.models import (
+    Division,
+    JobTitle,
+    Manager,
+    Owner,
+    RequestStatus,
+    Staff,
+    Vacations,
+)
+from employee_time_management.calendar import dept_calendar_token
+from employee_time_management.synthetic import seed_company
+from employee_time_management.utils import (
+    annual_vacation,
+    create_payroll_export,
+    list_of_conflicing_dates,
+    vacation_days_used,
+)
+
+# The pages to time, as (label, role, url name, url arguments). Each page is
+# loaded by the role it is meant for. "<export>" and "<token>" stand for the
+# payroll export and department calendar made for the benchmark.
+PAGES = [
+    ("employee info", "employee", "employee", []),
+    ("time off form", "employee", "timeoff", []),
+    ("overtime form", "employee", "overtime", []),
+    ("api balance", "employee", "api_balance", []),
+    ("api vacations", "employee", "api_requests", ["vacations"]),
+    ("approve time off", "manager", "approve_timeoff", []),
+    ("approve overtime", "manager", "approve_overtime", []),
+    ("sick days", "manager", "sickdays", []),
+    ("vacation history export", "manager", "history_export", ["vacations"]),
+    ("department calendar", None, "dept_calendar", ["<token>"]),
+    ("department stats", "owner", "deptstats", []),
+    ("hr info", "hr", "hrinfo", []),
+    ("payroll csv", "hr", "payroll_csv", ["<export>"]),
+]
+
+
+def percentile(samples, percent):
+    # Nearest-rank percentile, which is defined for any number of samples.
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[rank - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a synthetic company, times the main views through the test client "
+        "and the hot conflict, entitlement and holiday utils, and prints JSON with "
+        "the p50/p95 time, query count and peak memory of each. The seeded rows "
+        "are deleted afterwards; run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--divisions", type=int, default=2)
+        parser.add_argument("--depts-per-division", type=int, default=5)
+        parser.add_argument("--staff-per-dept", type=int, default=20)
+        parser.add_argument("--vacations-per-staff", type=int, default=10)
+        parser.add_argument("--overtime-per-staff", type=int, default=10)
+        parser.add_argument("--sick-days-per-staff", type=int, default=5)
+        parser.add_argument("--years", type=int, default=3)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Write the JSON to this file.")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded rows.")
+
+    def handle(self, *args, **options):
+        prefix = "benchco"
+        company = seed_company(
+            divisions=options["divisions"],
+            depts_per_division=options["depts_per_division"],
+            staff_per_dept=options["staff_per_dept"],
+            vacations_per_staff=options["vacations_per_staff"],
+            overtime_per_staff=options["overtime_per_staff"],
+            sick_days_per_staff=options["sick_days_per_staff"],
+            years=options["years"],
+            seed=options["seed"],
+            prefix=prefix,
+        )
+        export = None
+        try:
+            manager = (
+                Manager.objects.filter(dept__name__startswith=prefix)
+                .select_related("name__user", "dept__division")
+                .order_by("pk")
+                .first()
+            )
+            dept = manager.dept
+            User = get_user_model()
+            hr = User.objects.create(username=f"{prefix}_hr", is_superuser=True)
+            Staff.objects.create(user=hr, dept=dept)
+            owner = Staff.objects.create(
+                user=User.objects.create(username=f"{prefix}_owner"),
+                dept=dept,
+                is_owner=True,
+            )
+            Owner.objects.create(name=owner)
+            employee = Staff.objects.filter(dept=dept, is_employee=True).order_by("pk")[
+                0
+            ]
+            users = {
+                "employee": employee.user,
+                "manager": manager.name.user,
+                "owner": owner.user,
+                "hr": hr,
+            }
+            export = create_payroll_export(hr)
+            fixtures = {"<export>": export.pk, "<token>": dept_calendar_token(dept)}
+
+            results = [
+                self.bench_page(label, users.get(role), name, args, fixtures, options)
+                for label, role, name, args in PAGES
+            ]
+            results += [
+                self.bench(label, "util", function, options["repeat"])
+                for label, function in self.hot_utils(dept, employee)
+            ]
+            report = {
+                "database": connection.vendor,
+                "company": company,
+                "repeat": options["repeat"],
+                "results": results,
+            }
+        finally:
+            if not options["keep"]:
+                if export is not None:
+                    export.delete()
+                get_user_model().objects.filter(
+                    username__startswith=f"{prefix}_"
+                ).delete()
+                Division.objects.filter(name__startswith=prefix).delete()
+                JobTitle.objects.filter(title__startswith=prefix).delete()
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+        else:
+            self.stdout.write(output)
+
+    def hot_utils(self, dept, employee):
+        # The inputs are read once up front, so only the utils themselves are timed.
+        approved = list(
+            Vacations.objects.filter(dept=dept, status=RequestStatus.APPROVED)
+        )
+        pending = list(
+            Vacations.objects.filter(dept=dept, status=RequestStatus.PENDING)
+        )
+        max_staff_off = max(dept.staff_num - dept.min_staff, 0)
+        today = datetime.date.today()
+        division_id = dept.division_id
+        return [
+            (
+                "list_of_conflicing_dates",
+                lambda: list_of_conflicing_dates(pending, approved, max_staff_off),
+            ),
+            ("annual_vacation", lambda: annual_vacation(employee)),
+            (
+                "vacation_days_used",
+                lambda: vacation_days_used(
+                    today - datetime.timedelta(days=365), today, division_id
+                ),
+            ),
+        ]
+
+    def bench_page(self, label, user, name, args, fixtures, options):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        url = reverse(name, args=[fixtures.get(arg, arg) for arg in args])
+
+        def get():
+            response = client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            return response.status_code
+
+        # The test client's host has to be allowed, as it is under the test runner.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            result = self.bench(label, "view", get, options["repeat"])
+        result["url"] = url
+        client.logout()
+        return result
+
+    def bench(self, label, kind, function, repeat):
+        """
+        Times a function and measures the queries and memory of one call.
+
+        The function is called once untimed to fill the in-process caches, then `repeat` times for the timings, and
+        once more with tracemalloc running, which would otherwise slow the timed calls.
+        """
+        function()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - start) * 1000)
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                value = function()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        result = {
+            "name": label,
+            "kind": kind,
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p95_ms": round(percentile(timings, 95), 3),
+            "queries": len(queries),
+            "peak_memory_kb": round(peak / 1024, 1),
+        }
+        if kind == "view":
+            result["status"] = value
+        return result
@@ -0,0 +1,140 @@
+import datetime
+import random
+import timeit
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+
+from employee_time_management.utils import list_of_conflicing_dates
+
+
+# The per-day check the views used before list_of_conflicing_dates, kept here as
+# the baseline the sweep-line version is checked and timed against.
+def vacation_conflict(start, end, vacations, max_staff_off):
+    """
+    Checks for conflicts in vacation requests based on maximum allowable staff off.
+
+    This function determines if there are any date conflicts in vacation requests by checking the number of employees
+    scheduled to be off during a given period. It compares the requested vacation dates against existing vacation dates
+    to see if the number of staff off on any day exceeds the maximum allowable staff off for the department.
+
+    The function performs the following tasks:
+    - Iterates over the range of days in the requested vacation period and initializes a count for each day.
+    - Iterates over the existing vacations and increments the count for each day an employee is already scheduled off.
+    - Identifies and returns a list of dates where the number of staff off exceeds the allowable limit.
+
+    Parameters:
+    - start: The start date of the requested vacation.
+    - end: The end date of the requested vacation.
+    - vacations: A queryset of existing vacation requests.
+    - max_staff_off: The maximum number of staff allowed to be off on any given day.
+
+    Returns:
+    - A list of dates where the number of vacation requests exceeds the maximum allowable staff off.
+    """
+
+    start = start
+    end = end
+
+    delta = end - start
+    dict1 = {}
+    for i in range(delta.days + 1):
+        day = start + datetime.timedelta(days=i)
+        dict1[day] = 0
+
+    for vacation in vacations:
+        start = vacation.start_date
+        end = vacation.end_date
+        delta = end - start
+
+        list1 = []
+        for i in range(delta.days + 1):
+            day = start + datetime.timedelta(days=i)
+            list1.append(day)
+
+        for item in list1:
+            if item in dict1:
+                dict1[item] += 1
+
+    conflicts = [k for k, v in dict1.items() if int(v) >= max_staff_off]
+
+    return conflicts
+
+
+def per_request_conflicts(requested_vacations, approved_vacations, max_staff_off):
+    # The original approach: expand every approved vacation for every request.
+    return [
+        (
+            vacation,
+            vacation_conflict(
+                vacation.start_date,
+                vacation.end_date,
+                approved_vacations,
+                max_staff_off,
+            ),
+        )
+        for vacation in requested_vacations
+    ]
+
+
+def random_vacations(rng, count, first_day, days, max_length):
+    vacations = []
+    for _ in range(count):
+        start = first_day + datetime.timedelta(days=rng.randrange(days))
+        length = rng.randrange(max_length)
+        vacations.append(
+            SimpleNamespace(
+                start_date=start, end_date=start + datetime.timedelta(days=length)
+            )
+        )
+    return vacations
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the per-request and sweep-line conflict checks on synthetic "
+        "vacations, verifying they agree and timing both."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--approved", type=int, default=500)
+        parser.add_argument("--requested", type=int, default=50)
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--max-length", type=int, default=15)
+        parser.add_argument("--max-staff-off", type=int, default=3)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        first_day = datetime.date.today()
+        approved = random_vacations(
+            rng, options["approved"], first_day, options["days"], options["max_length"]
+        )
+        requested = random_vacations(
+            rng, options["requested"], first_day, options["days"], options["max_length"]
+        )
+        max_staff_off = options["max_staff_off"]
+
+        old = per_request_conflicts(requested, approved, max_staff_off)
+        new = list_of_conflicing_dates(requested, approved, max_staff_off)
+        if old != new:
+            raise CommandError("Conflict lists differ between the two versions.")
+        conflicts = sum(len(dates) for _, dates in new)
+        self.stdout.write(
+            f"{len(requested)} requests against {len(approved)} approved vacations: "
+            f"{conflicts} conflicting days, identical in both versions."
+        )
+
+        for label, function in [
+            ("per-request", per_request_conflicts),
+            ("sweep-line", list_of_conflicing_dates),
+        ]:
+            best = min(
+                timeit.repeat(
+                    lambda: function(requested, approved, max_staff_off),
+                    repeat=options["repeat"],
+                    number=1,
+                )
+            )
+            self.stdout.write(f"{label:>12}: {best * 1000:.2f} ms")
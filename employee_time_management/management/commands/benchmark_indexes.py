@@ -0,0 +1,160 @@
+import datetime
+import timeit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from employee_time_management.models import (
+    Dept,
+    Division,
+    JobTitle,
+    Overtime,
+    RequestStatus,
+    SickDays,
+    Vacations,
+)
+from employee_time_management.synthetic import seed_company
+
+INDEXED_MODELS = [Vacations, Overtime, SickDays]
+
+
+def hot_queries(dept, date):
+    # The filters the manager and dashboard views run on every page load.
+    return [
+        (
+            "pending vacations",
+            Vacations.objects.filter(
+                dept=dept,
+                is_employee=True,
+                status=RequestStatus.PENDING,
+            ).order_by("name"),
+        ),
+        (
+            "approved vacations on a date",
+            Vacations.objects.filter(
+                dept=dept,
+                status=RequestStatus.APPROVED,
+                start_date__lte=date,
+                end_date__gte=date,
+            ),
+        ),
+        (
+            "pending overtime",
+            Overtime.objects.filter(
+                dept=dept,
+                is_employee=True,
+                status=RequestStatus.PENDING,
+            ).order_by("name"),
+        ),
+        (
+            "denied overtime",
+            Overtime.objects.filter(dept=dept, status=RequestStatus.DENIED),
+        ),
+        ("sick days on a date", SickDays.objects.filter(dept=dept, date=date)),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a synthetic company and shows the EXPLAIN plans and timings of the "
+        "hot Vacations, Overtime and SickDays filters with and without their indexes. "
+        "The seeded rows are deleted afterwards; run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--divisions", type=int, default=4)
+        parser.add_argument("--depts-per-division", type=int, default=10)
+        parser.add_argument("--staff-per-dept", type=int, default=50)
+        parser.add_argument("--vacations-per-staff", type=int, default=20)
+        parser.add_argument("--overtime-per-staff", type=int, default=40)
+        parser.add_argument("--sick-days-per-staff", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded rows.")
+
+    def handle(self, *args, **options):
+        prefix = "benchidx"
+        counts = seed_company(
+            divisions=options["divisions"],
+            depts_per_division=options["depts_per_division"],
+            staff_per_dept=options["staff_per_dept"],
+            vacations_per_staff=options["vacations_per_staff"],
+            overtime_per_staff=options["overtime_per_staff"],
+            sick_days_per_staff=options["sick_days_per_staff"],
+            seed=options["seed"],
+            prefix=prefix,
+        )
+        self.stdout.write(
+            "Seeded " + ", ".join(f"{n} {name}" for name, n in counts.items())
+        )
+
+        try:
+            dept = Dept.objects.filter(name__startswith=prefix).first()
+            date = datetime.date.today() - datetime.timedelta(days=180)
+            queries = hot_queries(dept, date)
+
+            self.drop_indexes()
+            before = self.run_queries(queries, "without indexes", options["repeat"])
+            self.create_indexes()
+            after = self.run_queries(queries, "with indexes", options["repeat"])
+
+            self.stdout.write("\n== Summary (best of %d runs)" % options["repeat"])
+            for label, _ in queries:
+                self.stdout.write(
+                    f"{label:>30}: {before[label] * 1000:8.3f} ms -> "
+                    f"{after[label] * 1000:8.3f} ms"
+                )
+        finally:
+            # Leave the indexes in place even if a query failed part way.
+            self.create_indexes()
+            if not options["keep"]:
+                get_user_model().objects.filter(
+                    username__startswith=f"{prefix}_"
+                ).delete()
+                Division.objects.filter(name__startswith=prefix).delete()
+                JobTitle.objects.filter(title__startswith=prefix).delete()
+
+    def existing_indexes(self, model):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, model._meta.db_table
+            )
+        return set(constraints)
+
+    def drop_indexes(self):
+        with connection.schema_editor() as schema_editor:
+            for model in INDEXED_MODELS:
+                existing = self.existing_indexes(model)
+                for index in model._meta.indexes:
+                    if index.name in existing:
+                        schema_editor.remove_index(model, index)
+        self.analyze()
+
+    def create_indexes(self):
+        with connection.schema_editor() as schema_editor:
+            for model in INDEXED_MODELS:
+                existing = self.existing_indexes(model)
+                for index in model._meta.indexes:
+                    if index.name not in existing:
+                        schema_editor.add_index(model, index)
+        self.analyze()
+
+    def analyze(self):
+        # Refresh the planner statistics so the plans reflect the seeded data.
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def run_queries(self, queries, heading, repeat):
+        self.stdout.write(f"\n== {heading}")
+        timings = {}
+        for label, queryset in queries:
+            self.stdout.write(f"\n-- {label}")
+            if connection.vendor == "postgresql":
+                self.stdout.write(queryset.explain(analyze=True))
+            else:
+                self.stdout.write(queryset.explain())
+            timings[label] = min(
+                timeit.repeat(lambda: list(queryset.all()), repeat=repeat, number=1)
+            )
+        return timings
@@ -0,0 +1,47 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from employee_time_management.importing import STAFF_IMPORT_COLUMNS, import_staff
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates employees from a CSV file with the columns "
+        + ", ".join(STAFF_IMPORT_COLUMNS)
+        + ". Rows with errors are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The CSV file to import.")
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Check the file and report errors without creating anyone.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            file = open(options["path"], newline="", encoding="utf-8-sig")
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+        with file:
+            reader = csv.DictReader(file)
+            missing = set(STAFF_IMPORT_COLUMNS) - set(reader.fieldnames or [])
+            missing.discard("anniversary_date")
+            if missing:
+                raise CommandError(
+                    "Missing columns: " + ", ".join(sorted(missing)) + "."
+                )
+            created, errors = import_staff(
+                enumerate(reader, start=2), options["chunk_size"], options["dry_run"]
+            )
+        for line, message in errors:
+            self.stderr.write(f"Line {line}: {message}")
+        verb = "Would import" if options["dry_run"] else "Imported"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {created} staff, skipped {len(errors)} rows with errors."
+            )
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from employee_time_management.utils import rebuild_occupancy
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the per-department daily occupancy table from the approved "
+        "vacation and sick day history."
+    )
+
+    def handle(self, *args, **options):
+        rows = rebuild_occupancy()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} occupancy rows."))
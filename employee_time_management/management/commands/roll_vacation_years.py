@@ -0,0 +1,27 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from employee_time_management.utils import roll_vacation_years
+
+
+class Command(BaseCommand):
+    help = (
+        "Resets vacation used and moves the update date on for every staff "
+        "member whose vacation year has ended."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            type=datetime.date.fromisoformat,
+            default=None,
+            help="Roll over staff due on or before this date (YYYY-MM-DD). "
+            "Defaults to today.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        date = options["date"] or datetime.date.today()
+        rolled = roll_vacation_years(date, options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rolled over {rolled} staff."))
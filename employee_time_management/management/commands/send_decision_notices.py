@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from employee_time_management.notices import send_decision_notices
+
+
+class Command(BaseCommand):
+    help = (
+        "Emails each employee one digest of the decisions made on their vacation "
+        "and overtime requests since the last run. Schedule it, or run it with "
+        "--loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, sending the digests every --interval seconds.",
+        )
+        parser.add_argument("--interval", type=float, default=300)
+
+    def handle(self, *args, **options):
+        while True:
+            sent = send_decision_notices()
+            self.stdout.write(self.style.SUCCESS(f"Sent {sent} digest emails."))
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from employee_time_management.outbox import OUTBOX_MAX_ATTEMPTS, send_outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends every email in the outbox that is due, in batches, retrying "
+        "failures with backoff. With --loop it keeps running as a worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--max-attempts", type=int, default=OUTBOX_MAX_ATTEMPTS)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, checking the outbox again when it is empty.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to wait between checks of an empty outbox with --loop.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_outbox(batch_size, options["max_attempts"])
+            total_sent += sent
+            total_failed += failed
+            if options["loop"] and (sent or failed):
+                self.stdout.write(f"Sent {sent} emails, {failed} failed.")
+            # A short batch means the outbox has nothing more that is due yet.
+            if sent + failed < batch_size:
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Sent {total_sent} emails, {total_failed} failed.")
+        )
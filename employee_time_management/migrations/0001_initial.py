@@ -0,0 +1,374 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:22
+
+import datetime
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import employee_time_management.models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Allowed_vacation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("years_employed", models.IntegerField(unique=True)),
+                ("annual_vacation_hours", models.IntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Dept",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=64, unique=True)),
+                ("staff_num", models.IntegerField(default=1)),
+                ("min_staff", models.IntegerField(default=1)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Division",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=64, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="JobTitle",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("title", models.CharField(max_length=64, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Manager",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("approve_expense", models.BooleanField(default=False)),
+                ("approve_any_staff", models.BooleanField(default=False)),
+                (
+                    "dept",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="employee_time_management.dept",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Staff",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "anniversary_date",
+                    models.DateField(
+                        blank=True, default=datetime.date.today, null=True
+                    ),
+                ),
+                (
+                    "update_on",
+                    models.DateField(
+                        default=employee_time_management.models.one_year_from_today
+                    ),
+                ),
+                ("updated_hours", models.BooleanField(default=True)),
+                ("vacation_used", models.FloatField(default=0)),
+                ("overtime_hours", models.FloatField(default=0)),
+                ("unpaid_time", models.FloatField(default=0)),
+                ("is_employee", models.BooleanField(default=False)),
+                ("is_manager", models.BooleanField(default=False)),
+                ("is_owner", models.BooleanField(default=False)),
+                (
+                    "dept",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="employee_time_management.dept",
+                    ),
+                ),
+                (
+                    "job_title",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="employee_time_management.jobtitle",
+                    ),
+                ),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Vacations",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("start_date", models.DateField()),
+                ("end_date", models.DateField()),
+                ("is_employee", models.BooleanField(default=True)),
+                ("total_hours_away", models.FloatField(default=0)),
+                ("hours_unpaid", models.FloatField(default=0)),
+                ("overtime", models.FloatField(default=0)),
+                ("request_submitted", models.BooleanField(default=True)),
+                ("request_approved", models.BooleanField(default=False)),
+                ("request_denied", models.BooleanField(default=False)),
+                (
+                    "approved_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="employee_time_management.manager",
+                    ),
+                ),
+                (
+                    "dept",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="employee_time_management.dept",
+                    ),
+                ),
+                (
+                    "name",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="employee_time_management.staff",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Owner",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("approve_expense", models.BooleanField(default=True)),
+                ("approve_any_staff", models.BooleanField(default=True)),
+                (
+                    "name",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="employee_time_management.staff",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Overtime",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("ot_hours", models.FloatField(default=0)),
+                ("is_employee", models.BooleanField(default=True)),
+                ("request_submitted", models.BooleanField(default=True)),
+                ("request_approved", models.BooleanField(default=False)),
+                ("request_denied", models.BooleanField(default=False)),
+                (
+                    "approved_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="employee_time_management.manager",
+                    ),
+                ),
+                (
+                    "dept",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="employee_time_management.dept",
+                    ),
+                ),
+                (
+                    "name",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="employee_time_management.staff",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="manager",
+            name="name",
+            field=models.OneToOneField(
+                on_delete=django.db.models.deletion.CASCADE,
+                to="employee_time_management.staff",
+            ),
+        ),
+        migrations.CreateModel(
+            name="LeaveOfAbsense",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("start_date", models.DateField()),
+                ("end_date", models.DateField()),
+                ("total_hours_away", models.IntegerField()),
+                ("unpaid", models.BooleanField()),
+                ("hours_unpaid", models.FloatField(default=0)),
+                (
+                    "approved_by",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="employee_time_management.manager",
+                    ),
+                ),
+                (
+                    "name",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="employee_time_management.staff",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="dept",
+            name="division",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                to="employee_time_management.division",
+            ),
+        ),
+        migrations.CreateModel(
+            name="SickDays",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("total_hours_away", models.FloatField()),
+                ("hours_unpaid", models.FloatField(default=0)),
+                (
+                    "approved_by",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="employee_time_management.manager",
+                    ),
+                ),
+                (
+                    "dept",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="employee_time_management.dept",
+                    ),
+                ),
+                (
+                    "name",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="employee_time_management.staff",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("name", "date")},
+            },
+        ),
+    ]
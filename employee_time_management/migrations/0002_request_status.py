@@ -0,0 +1,94 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:22
+
+from django.db import migrations, models
+
+# The models whose requests had three request_* booleans before the status column.
+REQUEST_MODELS = ["Vacations", "Overtime"]
+
+
+def fill_status(apps, schema_editor):
+    # A denied request stays denied even if it was approved first, as the old views
+    # treated it. Nothing in the app left a request unsubmitted, so any that are
+    # count as withdrawn. Everything else keeps the default, pending.
+    for name in REQUEST_MODELS:
+        model = apps.get_model("employee_time_management", name)
+        model.objects.filter(request_denied=True).update(status="denied")
+        model.objects.filter(request_denied=False, request_approved=True).update(
+            status="approved"
+        )
+        model.objects.filter(
+            request_denied=False, request_approved=False, request_submitted=False
+        ).update(status="cancelled")
+
+
+def fill_request_columns(apps, schema_editor):
+    # The old columns come back with their defaults (submitted, not approved, not
+    # denied), so only the other statuses need setting.
+    for name in REQUEST_MODELS:
+        model = apps.get_model("employee_time_management", name)
+        model.objects.filter(status="denied").update(request_denied=True)
+        model.objects.filter(status="approved").update(request_approved=True)
+        model.objects.filter(status="cancelled").update(request_submitted=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("employee_time_management", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="overtime",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("approved", "Approved"),
+                    ("denied", "Denied"),
+                    ("cancelled", "Cancelled"),
+                ],
+                default="pending",
+                max_length=9,
+            ),
+        ),
+        migrations.AddField(
+            model_name="vacations",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("approved", "Approved"),
+                    ("denied", "Denied"),
+                    ("cancelled", "Cancelled"),
+                ],
+                default="pending",
+                max_length=9,
+            ),
+        ),
+        migrations.RunPython(fill_status, fill_request_columns),
+        migrations.RemoveField(
+            model_name="overtime",
+            name="request_submitted",
+        ),
+        migrations.RemoveField(
+            model_name="overtime",
+            name="request_approved",
+        ),
+        migrations.RemoveField(
+            model_name="overtime",
+            name="request_denied",
+        ),
+        migrations.RemoveField(
+            model_name="vacations",
+            name="request_submitted",
+        ),
+        migrations.RemoveField(
+            model_name="vacations",
+            name="request_approved",
+        ),
+        migrations.RemoveField(
+            model_name="vacations",
+            name="request_denied",
+        ),
+    ]
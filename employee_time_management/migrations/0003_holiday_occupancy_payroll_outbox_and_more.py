@@ -0,0 +1,280 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import employee_time_management.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("employee_time_management", "0002_request_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DecisionNotice",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("text", models.CharField(max_length=255)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DeptOccupancy",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("on_vacation", models.IntegerField(default=0)),
+                ("off_sick", models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Holiday",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=64)),
+                ("date", models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="OutboxEmail",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("to", models.EmailField(max_length=254)),
+                ("subject", models.CharField(max_length=255)),
+                ("body", models.TextField()),
+                ("from_email", models.CharField(blank=True, max_length=254)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("send_after", models.DateTimeField(default=django.utils.timezone.now)),
+                ("attempts", models.IntegerField(default=0)),
+                ("last_error", models.TextField(blank=True)),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="PayrollExport",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("confirmed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="PayrollExportLine",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("unpaid_time", models.FloatField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="dept",
+            name="calendar_modified_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="dept",
+            name="calendar_token",
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name="dept",
+            name="calendar_version",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="staff",
+            name="modified_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="staff",
+            name="version",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name="staff",
+            name="update_on",
+            field=models.DateField(
+                db_index=True,
+                default=employee_time_management.models.one_year_from_today,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="overtime",
+            index=models.Index(
+                fields=["dept", "status", "date"], name="overtime_dept_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="overtime",
+            index=models.Index(fields=["name", "date"], name="overtime_name_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="overtime",
+            index=models.Index(
+                condition=models.Q(("status", "pending")),
+                fields=["dept", "name"],
+                name="overtime_pending_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sickdays",
+            index=models.Index(fields=["dept", "date"], name="sickdays_dept_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="vacations",
+            index=models.Index(
+                fields=["dept", "status", "start_date", "end_date"],
+                name="vacations_dept_status_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="vacations",
+            index=models.Index(
+                fields=["name", "start_date", "end_date"],
+                name="vacations_name_dates_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="vacations",
+            index=models.Index(
+                condition=models.Q(("status", "pending")),
+                fields=["dept", "name"],
+                name="vacations_pending_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="payrollexportline",
+            name="export",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="lines",
+                to="employee_time_management.payrollexport",
+            ),
+        ),
+        migrations.AddField(
+            model_name="payrollexportline",
+            name="staff",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                to="employee_time_management.staff",
+            ),
+        ),
+        migrations.AddField(
+            model_name="payrollexport",
+            name="created_by",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="outboxemail",
+            index=models.Index(
+                condition=models.Q(("sent_at__isnull", True)),
+                fields=["send_after"],
+                name="outbox_unsent_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="holiday",
+            name="division",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="employee_time_management.division",
+            ),
+        ),
+        migrations.AddField(
+            model_name="deptoccupancy",
+            name="dept",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                to="employee_time_management.dept",
+            ),
+        ),
+        migrations.AddField(
+            model_name="decisionnotice",
+            name="staff",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                to="employee_time_management.staff",
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="payrollexportline",
+            unique_together={("export", "staff")},
+        ),
+        migrations.AlterUniqueTogether(
+            name="holiday",
+            unique_together={("date", "division")},
+        ),
+        migrations.AlterUniqueTogether(
+            name="deptoccupancy",
+            unique_together={("dept", "date")},
+        ),
+        migrations.AddIndex(
+            model_name="decisionnotice",
+            index=models.Index(
+                condition=models.Q(("sent_at__isnull", True)),
+                fields=["created_at"],
+                name="notice_unsent_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,86 @@
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import RangeOperators
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+from django.db.models import Exists, OuterRef, Q
+
+from employee_time_management.postgres import DateRange
+
+LIVE = Q(status__in=["pending", "approved"])
+
+
+def check_no_overlaps(apps, schema_editor):
+    # Adding the constraint fails on existing overlaps with an error that does not
+    # say which rows they are, so look for them first.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Vacations = apps.get_model("employee_time_management", "Vacations")
+    live = Vacations.objects.filter(LIVE)
+    overlapping = list(
+        live.filter(
+            Exists(
+                live.filter(
+                    name=OuterRef("name"),
+                    start_date__lte=OuterRef("end_date"),
+                    end_date__gte=OuterRef("start_date"),
+                ).exclude(pk=OuterRef("pk"))
+            )
+        )
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    if overlapping:
+        raise RuntimeError(
+            "These pending or approved vacations overlap another of the same "
+            "employee's: "
+            + ", ".join(map(str, overlapping))
+            + ". Deny or cancel one of each pair, then migrate again."
+        )
+
+
+class KeepBtreeGistExtension(BtreeGistExtension):
+    # Other tables may use the extension, so migrating back leaves it installed.
+    # This also keeps the backwards step from querying pg_extension on other
+    # databases, which CreateExtension does.
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        pass
+
+
+class AddConstraintOnPostgreSQL(migrations.AddConstraint):
+    # The constraint uses range types that other databases do not have, so it is
+    # only created on PostgreSQL and is kept out of the model state.
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("employee_time_management", "0003_holiday_occupancy_payroll_outbox_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_no_overlaps, migrations.RunPython.noop),
+        KeepBtreeGistExtension(),
+        AddConstraintOnPostgreSQL(
+            model_name="vacations",
+            constraint=ExclusionConstraint(
+                name="vacations_no_overlap_per_staff",
+                expressions=[
+                    ("name", RangeOperators.EQUAL),
+                    (DateRange("start_date", "end_date"), RangeOperators.OVERLAPS),
+                ],
+                condition=LIVE,
+            ),
+        ),
+    ]
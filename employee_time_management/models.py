@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.utils import timezone
 import datetime
 
 
@@ -16,6 +17,23 @@ class Division(models.Model):
         return f"{self.name}"
 
 
+class Holiday(models.Model):
+    name = models.CharField(max_length=64)
+    date = models.DateField(auto_now=False, auto_now_add=False)
+    division = models.ForeignKey(
+        Division, on_delete=models.CASCADE, null=True, blank=True
+    )
+
+    class Meta:
+        unique_together = (
+            "date",
+            "division",
+        )
+
+    def __str__(self):
+        return f"{self.name} ({self.date})"
+
+
 class Allowed_vacation(models.Model):
     years_employed = models.IntegerField(unique=True)
     annual_vacation_hours = models.IntegerField()
@@ -33,6 +51,14 @@ class Dept(models.Model):
     division = models.ForeignKey(Division, on_delete=models.CASCADE)
     staff_num = models.IntegerField(default=1)
     min_staff = models.IntegerField(default=1)
+    # Secret part of the department's absence calendar URL, made the first time
+    # a manager asks for it. Clear it in the admin to revoke the old URL.
+    calendar_token = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    # Moved on whenever something the department's calendar shows changes (an
+    # approved absence, or the name or department of someone on it), so the
+    # calendar can be cached until then.
+    calendar_version = models.IntegerField(default=0)
+    calendar_modified_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return f"{self.name}"
@@ -47,7 +73,7 @@ class Staff(models.Model):
         null=True,
         blank=True,
     )
-    update_on = models.DateField(default=one_year_from_today)
+    update_on = models.DateField(default=one_year_from_today, db_index=True)
     updated_hours = models.BooleanField(default=True)
     dept = models.ForeignKey(Dept, on_delete=models.CASCADE, null=True, blank=True)
     job_title = models.ForeignKey(
@@ -59,6 +85,11 @@ class Staff(models.Model):
     is_employee = models.BooleanField(default=False)
     is_manager = models.BooleanField(default=False)
     is_owner = models.BooleanField(default=False)
+    # Moved on whenever the staff member's balances or requests change (see
+    # utils.staff_version_bump), so API clients can tell whether what they have
+    # cached is still current.
+    version = models.IntegerField(default=0)
+    modified_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return f"{self.user} ({self.job_title}) in {self.dept} department"
@@ -86,6 +117,13 @@ class Owner(models.Model):
     approve_any_staff = models.BooleanField(default=True)
 
 
+class RequestStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    APPROVED = "approved", "Approved"
+    DENIED = "denied", "Denied"
+    CANCELLED = "cancelled", "Cancelled"
+
+
 class Vacations(models.Model):
     name = models.ForeignKey(Staff, on_delete=models.CASCADE)
     dept = models.ForeignKey(Dept, on_delete=models.CASCADE, blank=True, null=True)
@@ -95,13 +133,30 @@ class Vacations(models.Model):
     total_hours_away = models.FloatField(default=0)
     hours_unpaid = models.FloatField(default=0)
     overtime = models.FloatField(default=0)
-    request_submitted = models.BooleanField(default=True)
-    request_approved = models.BooleanField(default=False)
-    request_denied = models.BooleanField(default=False)
+    status = models.CharField(
+        max_length=9, choices=RequestStatus.choices, default=RequestStatus.PENDING
+    )
     approved_by = models.ForeignKey(
         Manager, on_delete=models.CASCADE, blank=True, null=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["dept", "status", "start_date", "end_date"],
+                name="vacations_dept_status_idx",
+            ),
+            models.Index(
+                fields=["name", "start_date", "end_date"],
+                name="vacations_name_dates_idx",
+            ),
+            models.Index(
+                fields=["dept", "name"],
+                name="vacations_pending_idx",
+                condition=models.Q(status=RequestStatus.PENDING),
+            ),
+        ]
+
     def __str__(self):
         return f"{self.name} {self.start_date} to {self.end_date}"
 
@@ -112,13 +167,27 @@ class Overtime(models.Model):
     date = models.DateField(auto_now=False, auto_now_add=False)
     ot_hours = models.FloatField(default=0)
     is_employee = models.BooleanField(default=True)
-    request_submitted = models.BooleanField(default=True)
-    request_approved = models.BooleanField(default=False)
-    request_denied = models.BooleanField(default=False)
+    status = models.CharField(
+        max_length=9, choices=RequestStatus.choices, default=RequestStatus.PENDING
+    )
     approved_by = models.ForeignKey(
         Manager, on_delete=models.CASCADE, blank=True, null=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["dept", "status", "date"],
+                name="overtime_dept_status_idx",
+            ),
+            models.Index(fields=["name", "date"], name="overtime_name_date_idx"),
+            models.Index(
+                fields=["dept", "name"],
+                name="overtime_pending_idx",
+                condition=models.Q(status=RequestStatus.PENDING),
+            ),
+        ]
+
     def __str__(self):
         return (
             f"{self.name.user.first_name} {self.name.user.last_name} requests "
@@ -139,6 +208,9 @@ class SickDays(models.Model):
             "name",
             "date",
         )
+        indexes = [
+            models.Index(fields=["dept", "date"], name="sickdays_dept_date_idx"),
+        ]
 
 
 class LeaveOfAbsense(models.Model):
@@ -150,3 +222,91 @@ class LeaveOfAbsense(models.Model):
     unpaid = models.BooleanField()
     hours_unpaid = models.FloatField(default=0)
     approved_by = models.ForeignKey(Manager, on_delete=models.CASCADE)
+
+
+class DeptOccupancy(models.Model):
+    dept = models.ForeignKey(Dept, on_delete=models.CASCADE)
+    date = models.DateField(auto_now=False, auto_now_add=False)
+    on_vacation = models.IntegerField(default=0)
+    off_sick = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = (
+            "dept",
+            "date",
+        )
+
+    def __str__(self):
+        return f"{self.dept} on {self.date}: {self.staff_off} staff off"
+
+    @property
+    def staff_off(self):
+        return self.on_vacation + self.off_sick
+
+
+class PayrollExport(models.Model):
+    created_at = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    confirmed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Payroll export {self.pk} ({self.created_at:%Y-%m-%d %H:%M})"
+
+
+class PayrollExportLine(models.Model):
+    export = models.ForeignKey(
+        PayrollExport, on_delete=models.CASCADE, related_name="lines"
+    )
+    staff = models.ForeignKey(Staff, on_delete=models.CASCADE)
+    unpaid_time = models.FloatField()
+
+    class Meta:
+        unique_together = (
+            "export",
+            "staff",
+        )
+
+
+class OutboxEmail(models.Model):
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    send_after = models.DateTimeField(default=timezone.now)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["send_after"],
+                name="outbox_unsent_idx",
+                condition=models.Q(sent_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.to}"
+
+
+class DecisionNotice(models.Model):
+    staff = models.ForeignKey(Staff, on_delete=models.CASCADE)
+    text = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["created_at"],
+                name="notice_unsent_idx",
+                condition=models.Q(sent_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.staff.user}: {self.text}"
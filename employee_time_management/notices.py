@@ -0,0 +1,95 @@
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DecisionNotice, RequestStatus, Vacations
+
+
+def queue_decisions(decided):
+    """
+    Queues a notice of each decided vacation or overtime request for its employee.
+
+    The notices are written with one insert, in the caller's transaction, and are emailed to the employees as digests
+    by `send_decision_notices`.
+
+    Parameters:
+    - decided: The Vacations or Overtime objects that were just approved or denied, with their new status.
+
+    Returns:
+    - None.
+    """
+
+    notices = []
+    for record in decided:
+        if isinstance(record, Vacations):
+            text = f"Vacation from {record.start_date} to {record.end_date}"
+        else:
+            text = f"Overtime on {record.date} ({record.ot_hours:g} hours)"
+        notices.append(
+            DecisionNotice(
+                staff_id=record.name_id,
+                text=f"{text}: {RequestStatus(record.status).label}",
+            )
+        )
+    DecisionNotice.objects.bulk_create(notices)
+
+
+def send_decision_notices(connection=None):
+    """
+    Emails employees the decisions made on their vacation and overtime requests since the last run.
+
+    Approving or denying a request only queues a notice, so the approval pages never wait on the email provider. This
+    function is run periodically by the `send_decision_notices` command. It gathers the queued notices into one digest
+    email per employee, however many of their requests were decided, and sends all the digests with a single
+    `send_messages()` call over one connection. The number of emails therefore grows with the number of employees,
+    not with the number of decisions.
+
+    The notices are locked while they are sent, skipping any another run has locked, and are marked as sent with one
+    update. If sending fails, nothing is marked and the notices are sent on the next run.
+
+    Parameters:
+    - connection: The email backend connection to use. Defaults to one for EMAIL_BACKEND.
+
+    Returns:
+    - The number of digest emails sent.
+    """
+
+    with transaction.atomic():
+        notices = list(
+            DecisionNotice.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(sent_at__isnull=True)
+            .select_related("staff__user")
+            .order_by("staff_id", "created_at", "pk")
+        )
+        digests = {}
+        for notice in notices:
+            digests.setdefault(notice.staff.user, []).append(notice.text)
+
+        messages = []
+        for user, lines in digests.items():
+            if not user.email:
+                continue
+            body = "\n".join(
+                [
+                    f"Hi {user.first_name or user.username},",
+                    "",
+                    "Your requests have been reviewed:",
+                    "",
+                    *[f"- {line}" for line in lines],
+                    "",
+                    "You can see all your requests on your employee page.",
+                ]
+            )
+            messages.append(
+                EmailMessage(
+                    "Updates to your time off and overtime requests",
+                    body,
+                    to=[user.email],
+                )
+            )
+        if messages:
+            (connection or get_connection()).send_messages(messages)
+        DecisionNotice.objects.filter(pk__in=[n.pk for n in notices]).update(
+            sent_at=timezone.now()
+        )
+    return len(messages)
@@ -0,0 +1,107 @@
+import datetime
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+# Outbox retries: a failed email waits OUTBOX_RETRY_SECONDS, doubling after each
+# further failure, and is given up on after OUTBOX_MAX_ATTEMPTS attempts.
+OUTBOX_RETRY_SECONDS = 60
+OUTBOX_MAX_ATTEMPTS = 6
+
+
+def queue_email(to, subject, body, from_email=""):
+    """
+    Writes an email to the outbox to be sent by the `send_outbox` worker.
+
+    Nothing is sent while the request is being handled. The email is saved in the caller's transaction, so it is only
+    sent if the change it describes is committed, and a slow or failing email provider cannot hold up the page.
+
+    Parameters:
+    - to: The recipient's email address.
+    - subject: The subject line.
+    - body: The plain text body.
+    - from_email: The sender. Defaults to DEFAULT_FROM_EMAIL when the email is sent.
+
+    Returns:
+    - The saved OutboxEmail object.
+    """
+
+    return OutboxEmail.objects.create(
+        to=to, subject=subject, body=body, from_email=from_email
+    )
+
+
+def send_outbox(batch_size=100, max_attempts=OUTBOX_MAX_ATTEMPTS, connection=None):
+    """
+    Sends a batch of emails that are due from the outbox.
+
+    The function performs the following tasks:
+    - Locks up to `batch_size` unsent emails that are due, skipping any another worker has locked, so several workers
+      can run at once without sending an email twice.
+    - Opens one connection to the email backend and sends every email in the batch over it.
+    - Marks the emails that were sent with one update.
+    - Puts each email that failed back in the queue with exponential backoff, recording the error. An email that has
+      failed `max_attempts` times is left in the outbox, unsent, for someone to look at.
+
+    Parameters:
+    - batch_size: The most emails to send in this batch.
+    - max_attempts: How many times to try an email before giving up on it.
+    - connection: The email backend connection to use. Defaults to one for EMAIL_BACKEND.
+
+    Returns:
+    - A tuple of the number of emails sent and the number that failed.
+    """
+
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(
+                sent_at__isnull=True, attempts__lt=max_attempts, send_after__lte=now
+            )
+            .order_by("send_after", "pk")[:batch_size]
+        )
+        if not emails:
+            return 0, 0
+
+        connection = connection or get_connection()
+        sent = []
+        failed = []
+        try:
+            connection.open()
+        except Exception as error:
+            failed = [(email, error) for email in emails]
+        else:
+            try:
+                for email in emails:
+                    message = EmailMessage(
+                        email.subject,
+                        email.body,
+                        email.from_email or None,
+                        [email.to],
+                        connection=connection,
+                    )
+                    try:
+                        message.send()
+                    except Exception as error:
+                        failed.append((email, error))
+                    else:
+                        sent.append(email.pk)
+            finally:
+                connection.close()
+
+        OutboxEmail.objects.filter(pk__in=sent).update(
+            sent_at=timezone.now(), attempts=F("attempts") + 1
+        )
+        for email, error in failed:
+            email.attempts += 1
+            email.send_after = now + datetime.timedelta(
+                seconds=OUTBOX_RETRY_SECONDS * 2 ** (email.attempts - 1)
+            )
+            email.last_error = f"{type(error).__name__}: {error}"
+            email.save(update_fields=["attempts", "send_after", "last_error"])
+    return len(sent), len(failed)
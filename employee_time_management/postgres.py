@@ -0,0 +1,23 @@
+from django.contrib.postgres.fields import DateRangeField, RangeBoundary
+from django.db.models import Func
+
+
+class DateRange(Func):
+    # Inclusive [start, end] date range, matching how vacation dates are stored.
+    function = "DATERANGE"
+    output_field = DateRangeField()
+
+    def __init__(self, start, end):
+        super().__init__(
+            start,
+            end,
+            RangeBoundary(inclusive_upper=True),
+            output_field=self.output_field,
+        )
+
+
+# One employee cannot have two live (pending or approved) vacation requests that
+# overlap. The constraint is added on PostgreSQL only, by migration
+# 0004_vacation_overlap, as other databases have no range types; the GiST index
+# behind it also serves the overlap lookup used when an employee applies.
+VACATION_OVERLAP_CONSTRAINT = "vacations_no_overlap_per_staff"
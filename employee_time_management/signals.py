@@ -0,0 +1,96 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import (
+    Allowed_vacation,
+    Holiday,
+    LeaveOfAbsense,
+    RequestStatus,
+    SickDays,
+    Staff,
+    Vacations,
+)
+from .calendar import touch_dept_calendars
+from .utils import clear_holiday_calendar, clear_vacation_tiers, update_occupancy
+
+
+@receiver(post_save, sender=Holiday)
+@receiver(post_delete, sender=Holiday)
+def holiday_changed(**kwargs):
+    clear_holiday_calendar()
+
+
+@receiver(post_save, sender=Allowed_vacation)
+@receiver(post_delete, sender=Allowed_vacation)
+def vacation_tier_changed(**kwargs):
+    clear_vacation_tiers()
+
+
+def _days_off(record):
+    # The (dept id, first day, last day, occupancy field) a vacation or sick day
+    # counts towards, or None if it does not count.
+    if record is None or record.dept_id is None:
+        return None
+    if isinstance(record, SickDays):
+        return record.dept_id, record.date, record.date, "off_sick"
+    if record.status == RequestStatus.APPROVED:
+        return record.dept_id, record.start_date, record.end_date, "on_vacation"
+    return None
+
+
+def _move_days_off(days_off, change):
+    if days_off is not None:
+        dept_id, start_date, end_date, field = days_off
+        update_occupancy(dept_id, start_date, end_date, **{field: change})
+
+
+@receiver(pre_save, sender=Vacations)
+@receiver(pre_save, sender=SickDays)
+def remember_days_off(sender, instance, **kwargs):
+    # What the row counted for before this save, so an edit made anywhere (a view,
+    # the admin, a shell) moves its days instead of counting them twice.
+    instance._days_off = None
+    if not instance._state.adding:
+        instance._days_off = _days_off(sender.objects.filter(pk=instance.pk).first())
+
+
+@receiver(post_save, sender=Vacations)
+@receiver(post_save, sender=SickDays)
+def record_days_off(instance, **kwargs):
+    before = getattr(instance, "_days_off", None)
+    after = _days_off(instance)
+    if before != after:
+        _move_days_off(before, -1)
+        _move_days_off(after, 1)
+
+
+@receiver(post_delete, sender=Vacations)
+@receiver(post_delete, sender=SickDays)
+def forget_days_off(instance, **kwargs):
+    _move_days_off(_days_off(instance), -1)
+
+
+@receiver(post_save, sender=Vacations)
+@receiver(post_save, sender=SickDays)
+def touch_absence_dept(instance, **kwargs):
+    # Only approved absences are on the calendar, so submitting, denying or
+    # cancelling a request leaves it alone. remember_days_off has noted what the
+    # row counted for before the save.
+    before = getattr(instance, "_days_off", None)
+    after = _days_off(instance)
+    if before != after:
+        touch_dept_calendars([days_off[0] for days_off in [before, after] if days_off])
+
+
+@receiver(post_delete, sender=Vacations)
+@receiver(post_delete, sender=SickDays)
+def touch_deleted_absence_dept(instance, **kwargs):
+    if _days_off(instance) is not None:
+        touch_dept_calendars([instance.dept_id])
+
+
+@receiver(post_save, sender=LeaveOfAbsense)
+@receiver(post_delete, sender=LeaveOfAbsense)
+def touch_leave_dept(instance, **kwargs):
+    # Leaves of absence are not filed against a department, so use the employee's.
+    touch_dept_calendars(Staff.objects.filter(pk=instance.name_id).values("dept_id"))
@@ -0,0 +1,194 @@
+import datetime
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .models import (
+    Dept,
+    Division,
+    JobTitle,
+    Manager,
+    Overtime,
+    RequestStatus,
+    SickDays,
+    Staff,
+    Vacations,
+)
+from .utils import rebuild_occupancy
+
+
+def random_status(state):
+    # As in a real company, most requests have been decided.
+    if state < 0.87:
+        return RequestStatus.APPROVED
+    if state < 0.97:
+        return RequestStatus.DENIED
+    return RequestStatus.PENDING
+
+
+def seed_company(
+    divisions=2,
+    depts_per_division=5,
+    staff_per_dept=20,
+    vacations_per_staff=10,
+    overtime_per_staff=10,
+    sick_days_per_staff=5,
+    years=3,
+    seed=0,
+    prefix="synthetic",
+):
+    """
+    Fills the database with a synthetic company for benchmarks.
+
+    Every department gets one manager and `staff_per_dept` employees. Each employee gets a history of
+    vacations, overtime requests and sick days spread over the last `years` years. As in a real company most
+    requests have been decided: about 87% are approved, 10% denied and 3% are still pending. Rows are inserted with `bulk_create`, so large companies can be seeded
+    quickly. The same seed always produces the same company.
+
+    Parameters:
+    - divisions: The number of divisions.
+    - depts_per_division: The number of departments in each division.
+    - staff_per_dept: The number of employees in each department, not counting the manager.
+    - vacations_per_staff: The number of vacation requests per employee.
+    - overtime_per_staff: The number of overtime requests per employee.
+    - sick_days_per_staff: The number of sick days per employee.
+    - years: How many years of history to spread the records over, ending today.
+    - seed: The random seed.
+    - prefix: Prefix for the names of the users, divisions and departments created.
+
+    Returns:
+    - A dict with the number of rows created for each model.
+    """
+
+    rng = random.Random(seed)
+    User = get_user_model()
+    today = datetime.date.today()
+    history_days = 365 * years
+    password = make_password(None)
+
+    with transaction.atomic():
+        job_title, _ = JobTitle.objects.get_or_create(title=f"{prefix} clerk")
+        division_rows = Division.objects.bulk_create(
+            [Division(name=f"{prefix} division {d}") for d in range(divisions)]
+        )
+        dept_rows = Dept.objects.bulk_create(
+            [
+                Dept(
+                    name=f"{prefix} dept {d}-{n}",
+                    division=division,
+                    staff_num=staff_per_dept,
+                    min_staff=max(1, staff_per_dept * 3 // 4),
+                )
+                for d, division in enumerate(division_rows)
+                for n in range(depts_per_division)
+            ]
+        )
+
+        users = []
+        for dept in dept_rows:
+            for n in range(staff_per_dept + 1):
+                username = f"{prefix}_{dept.pk}_{n}"
+                users.append(
+                    User(
+                        username=username,
+                        email=f"{username}@example.com",
+                        first_name=f"First{n}",
+                        last_name=f"Last{dept.pk}",
+                        password=password,
+                    )
+                )
+        users = User.objects.bulk_create(users, batch_size=1000)
+
+        staff_rows = []
+        for i, user in enumerate(users):
+            dept = dept_rows[i // (staff_per_dept + 1)]
+            is_manager = i % (staff_per_dept + 1) == 0
+            staff_rows.append(
+                Staff(
+                    user=user,
+                    dept=dept,
+                    job_title=job_title,
+                    anniversary_date=today
+                    - datetime.timedelta(days=rng.randrange(30, 365 * 15)),
+                    update_on=today + datetime.timedelta(days=rng.randrange(-30, 335)),
+                    vacation_used=rng.randrange(0, 80),
+                    overtime_hours=rng.randrange(0, 40),
+                    unpaid_time=rng.choice([0, 0, 0, 8, 16]),
+                    is_employee=not is_manager,
+                    is_manager=is_manager,
+                )
+            )
+        staff_rows = Staff.objects.bulk_create(staff_rows, batch_size=1000)
+        managers = Manager.objects.bulk_create(
+            [Manager(name=s, dept=s.dept) for s in staff_rows if s.is_manager]
+        )
+        manager_for = {m.dept_id: m for m in managers}
+
+        vacations = []
+        overtime = []
+        sick_days = []
+        for staff in staff_rows:
+            if staff.is_manager:
+                continue
+            # Non-overlapping vacations: one per slot of the employee's history.
+            slot = history_days // max(vacations_per_staff, 1)
+            for v in range(vacations_per_staff):
+                start = (
+                    today
+                    - datetime.timedelta(days=history_days - 30)
+                    + datetime.timedelta(
+                        days=v * slot + rng.randrange(max(slot - 10, 1))
+                    )
+                )
+                state = rng.random()
+                vacations.append(
+                    Vacations(
+                        name=staff,
+                        dept=staff.dept,
+                        start_date=start,
+                        end_date=start + datetime.timedelta(days=rng.randrange(1, 8)),
+                        total_hours_away=rng.randrange(8, 48, 8),
+                        status=random_status(state),
+                    )
+                )
+            for day in rng.sample(range(history_days), overtime_per_staff):
+                state = rng.random()
+                overtime.append(
+                    Overtime(
+                        name=staff,
+                        dept=staff.dept,
+                        date=today - datetime.timedelta(days=day),
+                        ot_hours=rng.choice([3, 6, 9]),
+                        status=random_status(state),
+                    )
+                )
+            for day in rng.sample(range(history_days), sick_days_per_staff):
+                sick_days.append(
+                    SickDays(
+                        name=staff,
+                        dept=staff.dept,
+                        date=today - datetime.timedelta(days=day),
+                        total_hours_away=8,
+                        approved_by=manager_for[staff.dept_id],
+                    )
+                )
+        # Insert in date order, as the rows would arrive in a real company, rather than grouped by employee.
+        vacations.sort(key=lambda v: v.start_date)
+        overtime.sort(key=lambda o: o.date)
+        sick_days.sort(key=lambda s: s.date)
+        Vacations.objects.bulk_create(vacations, batch_size=1000)
+        Overtime.objects.bulk_create(overtime, batch_size=1000)
+        SickDays.objects.bulk_create(sick_days, batch_size=1000)
+        # bulk_create skips the signals that keep the occupancy table up to date.
+        rebuild_occupancy(dept_rows)
+
+    return {
+        "divisions": len(division_rows),
+        "depts": len(dept_rows),
+        "staff": len(staff_rows),
+        "vacations": len(vacations),
+        "overtime": len(overtime),
+        "sick_days": len(sick_days),
+    }
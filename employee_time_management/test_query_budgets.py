@@ -0,0 +1,232 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .calendar import dept_calendar_token
+from .models import Dept, Manager, Overtime, Owner, Staff, Vacations
+from .synthetic import seed_company
+from .test_utils import TestCase
+from .utils import create_payroll_export
+
+# Every page in urls.py, as (url name, url arguments). "<export>" and "<token>"
+# stand for the payroll export and the department calendar made for the test.
+PAGES = [
+    ("home", []),
+    ("employee", []),
+    ("hrinfo", []),
+    ("payroll_export", []),
+    ("payroll_csv", ["<export>"]),
+    ("payroll_confirm", ["<export>"]),
+    ("history_export", ["vacations"]),
+    ("history_export", ["overtime"]),
+    ("history_export", ["sickdays"]),
+    ("timeoff", []),
+    ("overtime", []),
+    ("approve_timeoff", []),
+    ("approve_overtime", []),
+    ("sickdays", []),
+    ("deptstats", []),
+    ("dept_calendar", ["<token>"]),
+    ("api_balance", []),
+    ("api_requests", ["vacations"]),
+    ("api_requests", ["overtime"]),
+]
+
+# The queries a GET of each page may make for each role. The same budgets apply to
+# every size of company, so a page whose query count grows with the number of
+# staff fails. Pages a role cannot use redirect after looking the user up, and
+# pages that need a login redirect anonymous users without querying at all.
+BUDGETS = {
+    "anonymous": {
+        "home": 0,
+        "employee": 0,
+        "hrinfo": 0,
+        "payroll_export": 0,
+        "payroll_csv <export>": 0,
+        "payroll_confirm <export>": 0,
+        "history_export vacations": 0,
+        "history_export overtime": 0,
+        "history_export sickdays": 0,
+        "timeoff": 0,
+        "overtime": 0,
+        "approve_timeoff": 0,
+        "approve_overtime": 0,
+        "sickdays": 0,
+        "deptstats": 0,
+        "dept_calendar <token>": 1,
+        "api_balance": 0,
+        "api_requests vacations": 0,
+        "api_requests overtime": 0,
+    },
+    "employee": {
+        "home": 3,
+        "employee": 7,
+        "hrinfo": 3,
+        "payroll_export": 3,
+        "payroll_csv <export>": 3,
+        "payroll_confirm <export>": 3,
+        "history_export vacations": 3,
+        "history_export overtime": 3,
+        "history_export sickdays": 3,
+        "timeoff": 4,
+        "overtime": 4,
+        "approve_timeoff": 3,
+        "approve_overtime": 3,
+        "sickdays": 3,
+        "deptstats": 3,
+        "dept_calendar <token>": 1,
+        "api_balance": 3,
+        "api_requests vacations": 4,
+        "api_requests overtime": 4,
+    },
+    "manager": {
+        "home": 3,
+        "employee": 7,
+        "hrinfo": 3,
+        "payroll_export": 3,
+        "payroll_csv <export>": 3,
+        "payroll_confirm <export>": 3,
+        "history_export vacations": 4,
+        "history_export overtime": 4,
+        "history_export sickdays": 4,
+        "timeoff": 3,
+        "overtime": 3,
+        "approve_timeoff": 8,
+        "approve_overtime": 6,
+        "sickdays": 7,
+        "deptstats": 3,
+        "dept_calendar <token>": 1,
+        "api_balance": 3,
+        "api_requests vacations": 4,
+        "api_requests overtime": 4,
+    },
+    "owner": {
+        "home": 3,
+        "employee": 7,
+        "hrinfo": 7,
+        "payroll_export": 3,
+        "payroll_csv <export>": 5,
+        "payroll_confirm <export>": 4,
+        "history_export vacations": 4,
+        "history_export overtime": 4,
+        "history_export sickdays": 4,
+        "timeoff": 3,
+        "overtime": 3,
+        "approve_timeoff": 3,
+        "approve_overtime": 3,
+        "sickdays": 3,
+        "deptstats": 5,
+        "dept_calendar <token>": 1,
+        "api_balance": 3,
+        "api_requests vacations": 4,
+        "api_requests overtime": 4,
+    },
+    "hr": {
+        "home": 3,
+        "employee": 7,
+        "hrinfo": 7,
+        "payroll_export": 3,
+        "payroll_csv <export>": 5,
+        "payroll_confirm <export>": 4,
+        "history_export vacations": 4,
+        "history_export overtime": 4,
+        "history_export sickdays": 4,
+        "timeoff": 3,
+        "overtime": 3,
+        "approve_timeoff": 3,
+        "approve_overtime": 3,
+        "sickdays": 3,
+        "deptstats": 3,
+        "dept_calendar <token>": 1,
+        "api_balance": 3,
+        "api_requests vacations": 4,
+        "api_requests overtime": 4,
+    },
+}
+
+
+class QueryBudgetTest:
+    """
+    Checks the query count of every page for every role against `BUDGETS`.
+
+    Subclasses set `COMPANY` to the arguments for `seed_company`. The company is seeded once per class, and each page
+    is loaded once before it is measured so that the in-process caches (holidays, vacation tiers, calendars) are
+    warm, as they would be on a running server.
+    """
+
+    COMPANY = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_company(
+            vacations_per_staff=3,
+            overtime_per_staff=3,
+            sick_days_per_staff=2,
+            prefix="budget",
+            **cls.COMPANY,
+        )
+        User = get_user_model()
+        dept = Dept.objects.order_by("pk").first()
+        hr = User.objects.create(username="hr", is_superuser=True)
+        Staff.objects.create(user=hr, dept=dept)
+        owner = Staff.objects.create(
+            user=User.objects.create(username="owner"), dept=dept, is_owner=True
+        )
+        Owner.objects.create(name=owner)
+        employee = Staff.objects.filter(dept=dept, is_employee=True).order_by("pk")[0]
+        # Make sure the manager has requests to decide, whatever the seed gave.
+        start = datetime.date.today() + datetime.timedelta(days=60)
+        Vacations.objects.create(
+            name=employee, dept=dept, start_date=start, end_date=start
+        )
+        Overtime.objects.create(name=employee, dept=dept, date=start, ot_hours=3)
+        cls.users = {
+            "anonymous": None,
+            "employee": employee.user,
+            "manager": Manager.objects.get(dept=dept).name.user,
+            "owner": owner.user,
+            "hr": hr,
+        }
+        cls.export = create_payroll_export(hr)
+        cls.calendar_token = dept_calendar_token(dept)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        return len(
+            [q for q in queries if not q["sql"].startswith(("SAVEPOINT", "RELEASE"))]
+        )
+
+    def test_query_budgets(self):
+        for role, user in self.users.items():
+            self.client.logout()
+            if user is not None:
+                self.client.force_login(user)
+            for name, args in PAGES:
+                page = " ".join([name, *args])
+                fixtures = {"<export>": self.export.pk, "<token>": self.calendar_token}
+                url = reverse(name, args=[fixtures.get(arg, arg) for arg in args])
+                self.get(url)
+                with self.subTest(role=role, page=page):
+                    self.assertEquals(self.get(url), BUDGETS[role].get(page))
+
+
+class TenStaffQueryBudgetTest(QueryBudgetTest, TestCase):
+    COMPANY = {"divisions": 1, "depts_per_division": 2, "staff_per_dept": 5}
+
+
+class HundredStaffQueryBudgetTest(QueryBudgetTest, TestCase):
+    COMPANY = {"divisions": 2, "depts_per_division": 5, "staff_per_dept": 10}
+
+
+class ThousandStaffQueryBudgetTest(QueryBudgetTest, TestCase):
+    COMPANY = {"divisions": 2, "depts_per_division": 5, "staff_per_dept": 100}
@@ -0,0 +1,106 @@
+import datetime
+
+import django.test
+from django.contrib.auth import get_user_model
+
+from .models import Dept, Division, Manager, Staff, Vacations
+from .utils import clear_holiday_calendar, clear_vacation_tiers
+
+
+class ClearCachesMixin:
+    """
+    Empties the in-process holiday calendar and vacation tier caches around each test.
+
+    The caches are module globals, so the rollback at the end of a test does not undo them. Without this, a test could
+    see holidays or allowance tiers left over from an earlier test, and results would depend on the test order.
+    """
+
+    def run(self, result=None):
+        clear_holiday_calendar()
+        clear_vacation_tiers()
+        try:
+            return super().run(result)
+        finally:
+            clear_holiday_calendar()
+            clear_vacation_tiers()
+
+
+class TestCase(ClearCachesMixin, django.test.TestCase):
+    pass
+
+
+class TransactionTestCase(ClearCachesMixin, django.test.TransactionTestCase):
+    pass
+
+
+def make_approval_fixture(employees):
+    """
+    Creates a department with some employees, each with 16 hours of vacation used, 4 of unpaid time and 2 of overtime.
+
+    Returns:
+    - A (dept, staff) tuple, where staff is the list of employees, named emp0, emp1 and so on.
+    """
+
+    User = get_user_model()
+    div = Division.objects.create(name="Widget, Inc.")
+    dept = Dept.objects.create(name="Shipping", division=div)
+    staff = []
+    for i in range(employees):
+        user = User.objects.create(username=f"emp{i}", email=f"emp{i}@gmail.com")
+        staff.append(
+            Staff.objects.create(
+                user=user,
+                dept=dept,
+                is_employee=True,
+                vacation_used=16,
+                unpaid_time=4,
+                overtime_hours=2,
+            )
+        )
+    return dept, staff
+
+
+def add_manager(dept):
+    """
+    Makes a manager, "boss", for a department.
+
+    Returns:
+    - The Manager object.
+    """
+
+    boss = get_user_model().objects.create(username="boss", email="boss@gmail.com")
+    staff = Staff.objects.create(user=boss, dept=dept, is_manager=True)
+    return Manager.objects.create(name=staff, dept=dept)
+
+
+def add_vacation(staff, week=0, **kwargs):
+    """
+    Requests a Monday to Friday vacation for an employee, `week` weeks after January 8, 2024.
+
+    Returns:
+    - The saved Vacations object, 40 hours long unless `total_hours_away` is given.
+    """
+
+    start = datetime.date(2024, 1, 8) + datetime.timedelta(weeks=week)
+    return Vacations.objects.create(
+        name=staff,
+        dept=staff.dept,
+        start_date=start,
+        end_date=start + datetime.timedelta(days=4),
+        **{"total_hours_away": 40, **kwargs},
+    )
+
+
+class ApprovalTestCase(TestCase):
+    """
+    A TestCase with a department of `employees` employees from `make_approval_fixture` and its manager, made once for
+    the whole class in `setUpTestData`.
+    """
+
+    employees = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dept, cls.staff = make_approval_fixture(cls.employees)
+        cls.manager = add_manager(cls.dept)
+        cls.boss = cls.manager.name
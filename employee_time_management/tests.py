@@ -1,21 +1,62 @@
 from django.urls import resolve, reverse
-from django.test import TestCase
+from django.test import skipUnlessDBFeature
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test.utils import CaptureQueriesContext
+from django.conf import settings
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.apps import apps as django_apps
+from django.contrib import admin
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db.models import Q, Sum
+from django.utils import timezone
+import contextlib
 import datetime
+from importlib import import_module
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+from unittest import mock, skipUnless
 
+from users.admin import CustomUserAdmin
+from .admin import AllowedVacationAdmin, StaffAdmin
 from .views import time_off_request_view
 
 from .utils import (
     vacation_days_used,
+    vacation_days_used_batch,
+    annual_vacations,
     valid_date_range,
     annual_vacation,
     calculate_overtime_hours,
-    vacation_conflict,
+    list_of_conflicing_dates,
+    conflicting_dates_in_db,
     only_apply_for_one_vacation_date,
     add_year,
+    next_update_on,
     update_vacations,
+    roll_vacation_years,
+    staff_attendance,
+    staff_sick_days,
+    dept_staffing,
+    rebuild_occupancy,
+    update_occupancy,
+    confirm_payroll_export,
+    approve_vacation,
+    approve_vacations,
+    deny_vacation,
+    deny_vacations,
+    decide_overtime,
 )
+from .calendar import dept_calendar_token, _ical_line
+from .notices import send_decision_notices
+from .outbox import queue_email, send_outbox, OUTBOX_RETRY_SECONDS
 
 from .models import (
     Division,
@@ -26,6 +67,28 @@ from .models import (
     Staff,
     Owner,
     Vacations,
+    SickDays,
+    DeptOccupancy,
+    Holiday,
+    PayrollExport,
+    Overtime,
+    RequestStatus,
+    OutboxEmail,
+    DecisionNotice,
+    LeaveOfAbsense,
+)
+from .management.commands.benchmark_conflicts import (
+    random_vacations,
+    vacation_conflict,
+)
+from .synthetic import seed_company
+from .postgres import VACATION_OVERLAP_CONSTRAINT
+from .test_utils import (
+    ApprovalTestCase,
+    TestCase,
+    TransactionTestCase,
+    add_vacation,
+    make_approval_fixture,
 )
 
 
@@ -161,6 +224,14 @@ class EntryModelTest(TestCase):
             request_start, request_end, vacations
         )
         self.assertEquals(conflict, True)
+        conflict = only_apply_for_one_vacation_date(
+            datetime.date(2020, 1, 5), request_end, vacations
+        )
+        self.assertEquals(conflict, False)
+        conflict = only_apply_for_one_vacation_date(
+            datetime.date(2019, 12, 30), start, vacations
+        )
+        self.assertEquals(conflict, True)
 
     #########################
     # Helper function tests #
@@ -171,6 +242,32 @@ class EntryModelTest(TestCase):
         days = vacation_days_used(start, end)
         self.assertEquals(days, 96)
 
+    def test_vacation_days_match_day_by_day_count(self):
+        def day_by_day(start, end):
+            if start == end:
+                return 8
+            days = [
+                start + datetime.timedelta(days=i)
+                for i in range((end - start).days + 1)
+            ]
+            return len([day for day in days if day.weekday() <= 4]) * 8
+
+        rng = random.Random(4)
+        starts = []
+        ends = []
+        for _ in range(2000):
+            start = datetime.date(2020, 1, 1) + datetime.timedelta(
+                days=rng.randrange(1500)
+            )
+            end = start + datetime.timedelta(days=rng.randrange(-3, 400))
+            self.assertEquals(vacation_days_used(start, end), day_by_day(start, end))
+            starts.append(start)
+            ends.append(end)
+        self.assertEquals(
+            vacation_days_used_batch(starts, ends),
+            [day_by_day(start, end) for start, end in zip(starts, ends)],
+        )
+
     def test_single_vacation_day(self):
         start = datetime.date(2019, 12, 1)
         end = datetime.date(2019, 12, 1)
@@ -191,7 +288,7 @@ class EntryModelTest(TestCase):
         end = datetime.date(2019, 12, 27)
         Vacations.objects.create(name=user1, start_date=start, end_date=end)
         employee_vac = Vacations.objects.filter(name=user1).filter(
-            request_submitted=True
+            status=RequestStatus.PENDING
         )
         self.assertEquals(employee_vac[0].start_date, start)
 
@@ -214,7 +311,7 @@ class EntryModelTest(TestCase):
         Vacations.objects.create(
             name=staff2, dept=staff2.dept, start_date=start, end_date=end
         )
-        employee_vac = Vacations.objects.filter(request_submitted=True).filter(
+        employee_vac = Vacations.objects.filter(status=RequestStatus.PENDING).filter(
             dept=dept_name
         )
         self.assertEquals(employee_vac[0].name.user.username, "nancy")
@@ -248,3 +345,1966 @@ class EntryModelTest(TestCase):
         date = datetime.date(2020, 12, 23)
         update_vacations(staff, date)
         self.assertEquals(staff.vacation_used, 35)
+
+
+class HRInfoViewTest(TestCase):
+
+    def setUp(self):
+        User = get_user_model()
+        div = Division.objects.create(name="Widget, Inc.")
+        self.dept = Dept.objects.create(
+            name="Accounting", division=div, staff_num=4, min_staff=2
+        )
+        hr_user = User.objects.create(username="hr", email="hr@gmail.com")
+        hr_user.is_superuser = True
+        hr_user.save()
+        self.hr = Staff.objects.create(user=hr_user, dept=self.dept)
+        manager_user = User.objects.create(username="boss", email="boss@gmail.com")
+        manager_staff = Staff.objects.create(
+            user=manager_user, dept=self.dept, is_manager=True
+        )
+        self.manager = Manager.objects.create(name=manager_staff, dept=self.dept)
+        self.today = datetime.date.today()
+
+    def add_staff(self, count):
+        User = get_user_model()
+        start = Staff.objects.count()
+        staff = []
+        for i in range(start, start + count):
+            user = User.objects.create(username=f"emp{i}", email=f"emp{i}@gmail.com")
+            staff.append(
+                Staff.objects.create(user=user, dept=self.dept, is_employee=True)
+            )
+        return staff
+
+    def hr_info_queries(self, path=None):
+        self.client.force_login(self.hr.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path or reverse("hrinfo"))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_attendance_status(self):
+        on_vacation, sick, present = self.add_staff(3)
+        Vacations.objects.create(
+            name=on_vacation,
+            dept=self.dept,
+            start_date=self.today - datetime.timedelta(days=1),
+            end_date=self.today + datetime.timedelta(days=1),
+            status=RequestStatus.APPROVED,
+        )
+        Vacations.objects.create(
+            name=present,
+            dept=self.dept,
+            start_date=self.today,
+            end_date=self.today,
+        )
+        SickDays.objects.create(
+            name=sick,
+            dept=self.dept,
+            date=self.today,
+            total_hours_away=8,
+            approved_by=self.manager,
+        )
+        with self.assertNumQueries(1):
+            attendance = {s.pk: s.attendance for s in staff_attendance(self.today)}
+        self.assertEquals(attendance[on_vacation.pk], "Vacation")
+        self.assertEquals(attendance[sick.pk], "Sick")
+        self.assertEquals(attendance[present.pk], "Present")
+
+    def test_attendance_query_count_constant(self):
+        self.add_staff(2)
+        with self.assertNumQueries(1):
+            small = [str(s) for s in staff_attendance(self.today)]
+        self.add_staff(20)
+        with self.assertNumQueries(1):
+            large = [str(s) for s in staff_attendance(self.today)]
+        self.assertEquals(len(large), len(small) + 20)
+
+    def test_sick_days_window(self):
+        (staff,) = self.add_staff(1)
+        for date in [
+            datetime.date(2023, 3, 1),
+            datetime.date(2024, 3, 1),
+            datetime.date(2024, 6, 1),
+        ]:
+            SickDays.objects.create(
+                name=staff,
+                dept=self.dept,
+                date=date,
+                total_hours_away=8,
+                approved_by=self.manager,
+            )
+        all_time = staff_sick_days(Staff.objects.all()).get(pk=staff.pk)
+        self.assertEquals(all_time.sick_days, 3)
+        in_2024 = staff_sick_days(
+            Staff.objects.all(), datetime.date(2024, 1, 1), datetime.date(2024, 12, 31)
+        ).get(pk=staff.pk)
+        self.assertEquals(in_2024.sick_days, 2)
+
+    def test_hr_info_query_count_constant(self):
+        for staff in self.add_staff(2):
+            SickDays.objects.create(
+                name=staff,
+                dept=self.dept,
+                date=self.today,
+                total_hours_away=8,
+                approved_by=self.manager,
+            )
+        small = self.hr_info_queries()
+        self.add_staff(20)
+        self.assertEquals(self.hr_info_queries(), small)
+        self.assertEquals(self.hr_info_queries(reverse("hrinfo") + "?year=2024"), small)
+
+    def test_hr_info_year_out_of_range(self):
+        self.client.force_login(self.hr.user)
+        for year in ["0", "10000", "²", "abc"]:
+            response = self.client.get(reverse("hrinfo"), {"year": year})
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNone(response.context["year"])
+        response = self.client.get(reverse("hrinfo"), {"year": "2024"})
+        self.assertEquals(response.context["year"], 2024)
+
+
+class DeptStatsViewTest(TestCase):
+
+    def setUp(self):
+        User = get_user_model()
+        self.div = Division.objects.create(name="Widget, Inc.")
+        hr = Dept.objects.create(name="Human Resources", division=self.div)
+        owner_user = User.objects.create(username="owner", email="owner@gmail.com")
+        self.owner = Staff.objects.create(user=owner_user, dept=hr, is_owner=True)
+        self.today = datetime.date.today()
+
+    def add_dept(self, name, employees, min_staff):
+        User = get_user_model()
+        dept = Dept.objects.create(name=name, division=self.div, min_staff=min_staff)
+        staff = []
+        for i in range(employees):
+            user = User.objects.create(username=f"{name}{i}", email=f"{name}{i}@a.com")
+            staff.append(Staff.objects.create(user=user, dept=dept, is_employee=True))
+        manager = Manager.objects.create(name=staff[0], dept=dept)
+        return dept, staff, manager
+
+    def deptstats(self):
+        self.client.force_login(self.owner.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("deptstats"))
+        self.assertEqual(response.status_code, 200)
+        return response.context["deptstats"], len(queries)
+
+    def test_dept_staffing(self):
+        dept, staff, manager = self.add_dept("Shipping", 4, 3)
+        Vacations.objects.create(
+            name=staff[1],
+            dept=dept,
+            start_date=self.today,
+            end_date=self.today + datetime.timedelta(days=2),
+            status=RequestStatus.APPROVED,
+        )
+        Vacations.objects.create(
+            name=staff[2],
+            dept=dept,
+            start_date=self.today,
+            end_date=self.today,
+        )
+        SickDays.objects.create(
+            name=staff[3],
+            dept=dept,
+            date=self.today,
+            total_hours_away=8,
+            approved_by=manager,
+        )
+        self.add_dept("Receiving", 2, 1)
+        rebuild_occupancy()
+        with self.assertNumQueries(1):
+            depts = {d.name: d for d in dept_staffing(self.today)}
+        shipping = depts["Shipping"]
+        self.assertEquals(shipping.total_staff, 4)
+        self.assertEquals(shipping.on_vacation, 1)
+        self.assertEquals(shipping.off_sick, 1)
+        self.assertEquals(shipping.staff_present, 2)
+        self.assertEquals(shipping.understaffed, "Yes")
+        receiving = depts["Receiving"]
+        self.assertEquals(
+            [receiving.total_staff, receiving.on_vacation, receiving.off_sick],
+            [2, 0, 0],
+        )
+        self.assertEquals(receiving.understaffed, "No")
+        self.assertEquals(depts["Human Resources"].total_staff, 0)
+
+    def test_deptstats_view(self):
+        self.add_dept("Shipping", 3, 1)
+        deptstats, small = self.deptstats()
+        self.assertEquals(
+            [row[1:] for row in deptstats if row[0].name == "Shipping"],
+            [[3, 0, 0, 3, "No"]],
+        )
+        self.assertNotIn("Human Resources", [row[0].name for row in deptstats])
+        for i in range(10):
+            self.add_dept(f"Dept{i}", 2, 2)
+        deptstats, large = self.deptstats()
+        self.assertEquals(len(deptstats), 11)
+        self.assertEquals(large, small)
+
+
+class OccupancyTest(TestCase):
+
+    def setUp(self):
+        User = get_user_model()
+        div = Division.objects.create(name="Widget, Inc.")
+        self.dept = Dept.objects.create(name="Shipping", division=div, min_staff=1)
+        self.staff = []
+        for name in ["boss", "al", "nancy"]:
+            user = User.objects.create(username=name, email=f"{name}@gmail.com")
+            self.staff.append(
+                Staff.objects.create(user=user, dept=self.dept, is_employee=True)
+            )
+        boss = self.staff[0]
+        boss.is_employee = False
+        boss.is_manager = True
+        boss.save()
+        self.manager = Manager.objects.create(name=boss, dept=self.dept)
+        self.start = datetime.date.today() + datetime.timedelta(days=7)
+
+    def occupancy(self):
+        return {
+            o.date: (o.on_vacation, o.off_sick)
+            for o in DeptOccupancy.objects.filter(dept=self.dept)
+        }
+
+    def test_update_occupancy(self):
+        end = self.start + datetime.timedelta(days=2)
+        update_occupancy(self.dept.pk, self.start, end, on_vacation=1)
+        update_occupancy(self.dept.pk, end, end, off_sick=1)
+        occupancy = self.occupancy()
+        self.assertEquals(len(occupancy), 3)
+        self.assertEquals(occupancy[self.start], (1, 0))
+        self.assertEquals(occupancy[end], (1, 1))
+        self.assertEquals(DeptOccupancy.objects.get(date=end).staff_off, 2)
+
+    def test_approve_and_deny_maintain_occupancy(self):
+        vacation = Vacations.objects.create(
+            name=self.staff[1],
+            dept=self.dept,
+            start_date=self.start,
+            end_date=self.start + datetime.timedelta(days=1),
+        )
+        denied = Vacations.objects.create(
+            name=self.staff[2],
+            dept=self.dept,
+            start_date=self.start,
+            end_date=self.start,
+        )
+        self.client.force_login(self.manager.name.user)
+        url = reverse("approve_timeoff")
+        self.client.post(url, {"csrfmiddlewaretoken": "x", str(vacation.id): "Approve"})
+        self.client.post(url, {"csrfmiddlewaretoken": "x", str(vacation.id): "Approve"})
+        self.client.post(url, {"csrfmiddlewaretoken": "x", f"Deny {denied.id}": "Deny"})
+        occupancy = self.occupancy()
+        self.assertEquals(occupancy[self.start], (1, 0))
+        self.assertEquals(occupancy[self.start + datetime.timedelta(days=1)], (1, 0))
+
+        # Only pending requests can be decided, so this leaves it approved.
+        self.client.post(
+            url, {"csrfmiddlewaretoken": "x", f"Deny {vacation.id}": "Deny"}
+        )
+        self.assertEquals(self.occupancy()[self.start], (1, 0))
+
+    def test_sick_day_maintains_occupancy(self):
+        self.client.force_login(self.manager.name.user)
+        self.client.post(
+            reverse("sickdays"),
+            {"sickday": self.start.isoformat(), "Staff": "al (None) in Shipping"},
+        )
+        self.assertEquals(self.occupancy(), {self.start: (0, 1)})
+
+    def test_edits_outside_the_views_maintain_occupancy(self):
+        second = self.start + datetime.timedelta(days=1)
+        vacation = Vacations.objects.create(
+            name=self.staff[1],
+            dept=self.dept,
+            start_date=self.start,
+            end_date=second,
+        )
+        self.assertEquals(self.occupancy(), {})
+
+        vacation.status = RequestStatus.APPROVED
+        vacation.save()
+        self.assertEquals(self.occupancy(), {self.start: (1, 0), second: (1, 0)})
+
+        vacation.start_date = second
+        vacation.save()
+        self.assertEquals(self.occupancy(), {self.start: (0, 0), second: (1, 0)})
+
+        # Saving a copy loaded elsewhere must not count the vacation twice.
+        Vacations.objects.get(pk=vacation.pk).save()
+        self.assertEquals(self.occupancy()[second], (1, 0))
+
+        sick_day = SickDays.objects.create(
+            name=self.staff[2],
+            dept=self.dept,
+            date=second,
+            total_hours_away=8,
+            approved_by=self.manager,
+        )
+        self.assertEquals(self.occupancy()[second], (1, 1))
+
+        vacation.status = RequestStatus.CANCELLED
+        vacation.save()
+        sick_day.delete()
+        self.assertEquals(self.occupancy(), {self.start: (0, 0), second: (0, 0)})
+
+    def test_deleting_dept_with_absences(self):
+        SickDays.objects.create(
+            name=self.staff[2],
+            dept=self.dept,
+            date=self.start,
+            total_hours_away=8,
+            approved_by=self.manager,
+        )
+        self.dept.delete()
+        self.assertFalse(DeptOccupancy.objects.exists())
+
+    def test_rebuild_occupancy(self):
+        update_occupancy(self.dept.pk, self.start, self.start, on_vacation=5)
+        Vacations.objects.create(
+            name=self.staff[1],
+            dept=self.dept,
+            start_date=self.start,
+            end_date=self.start + datetime.timedelta(days=1),
+            status=RequestStatus.APPROVED,
+        )
+        Vacations.objects.create(
+            name=self.staff[2],
+            dept=self.dept,
+            start_date=self.start,
+            end_date=self.start,
+        )
+        SickDays.objects.create(
+            name=self.staff[2],
+            dept=self.dept,
+            date=self.start + datetime.timedelta(days=3),
+            total_hours_away=8,
+            approved_by=self.manager,
+        )
+        self.assertEquals(rebuild_occupancy(), 3)
+        self.assertEquals(
+            self.occupancy(),
+            {
+                self.start: (1, 0),
+                self.start + datetime.timedelta(days=1): (1, 0),
+                self.start + datetime.timedelta(days=3): (0, 1),
+            },
+        )
+
+
+class ConflictEngineTest(TestCase):
+
+    def random_vacations(self, rng, count):
+        # Up to ten days long, starting in the first 120 days of 2024.
+        return random_vacations(rng, count, datetime.date(2024, 1, 1), 120, 10)
+
+    def test_matches_per_request_conflicts(self):
+        rng = random.Random(1)
+        for _ in range(20):
+            approved = self.random_vacations(rng, rng.randrange(60))
+            requested = self.random_vacations(rng, rng.randrange(1, 15))
+            max_staff_off = rng.randrange(5)
+            expected = [
+                (
+                    v,
+                    vacation_conflict(
+                        v.start_date, v.end_date, approved, max_staff_off
+                    ),
+                )
+                for v in requested
+            ]
+            self.assertEquals(
+                list_of_conflicing_dates(requested, approved, max_staff_off), expected
+            )
+
+    def test_no_requested_vacations(self):
+        approved = self.random_vacations(random.Random(2), 5)
+        self.assertEquals(list_of_conflicing_dates([], approved, 1), [])
+
+    def random_dept(self, rng, name):
+        # A department whose staff each have one random vacation, half of them
+        # approved.
+        User = get_user_model()
+        div = Division.objects.create(name=f"{name} division")
+        dept = Dept.objects.create(name=name, division=div, min_staff=1)
+        for i, vacation in enumerate(self.random_vacations(rng, rng.randrange(1, 30))):
+            user = User.objects.create(
+                username=f"{name}_{i}", email=f"{name}_{i}@a.com"
+            )
+            Vacations.objects.create(
+                name=Staff.objects.create(user=user, dept=dept, is_employee=True),
+                dept=dept,
+                start_date=vacation.start_date,
+                end_date=vacation.end_date,
+                status=(
+                    RequestStatus.APPROVED
+                    if rng.random() < 0.5
+                    else RequestStatus.PENDING
+                ),
+            )
+        requested = Vacations.objects.filter(dept=dept, status=RequestStatus.PENDING)
+        approved = Vacations.objects.filter(dept=dept, status=RequestStatus.APPROVED)
+        return requested.order_by("pk"), approved
+
+    def test_conflicts_in_db_match_python(self):
+        # Outside PostgreSQL conflicting_dates_in_db falls back to the Python sweep,
+        # so this only covers the fallback there. The SQL is tested below.
+        requested, approved = self.random_dept(random.Random(3), "shipping")
+        for max_staff_off in range(4):
+            self.assertEquals(
+                conflicting_dates_in_db(requested, approved, max_staff_off),
+                list_of_conflicing_dates(requested, approved, max_staff_off),
+            )
+
+    @skipUnless(connection.vendor == "postgresql", "generate_series is PostgreSQL only")
+    def test_generate_series_query_matches_python(self):
+        rng = random.Random(5)
+        for case in range(20):
+            requested, approved = self.random_dept(rng, f"dept{case}")
+            expected = [
+                list_of_conflicing_dates(list(requested), list(approved), max_staff_off)
+                for max_staff_off in range(5)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                actual = [
+                    conflicting_dates_in_db(requested, approved, max_staff_off)
+                    for max_staff_off in range(5)
+                ]
+            self.assertEquals(actual, expected)
+            if requested:
+                self.assertIn("generate_series", queries[-1]["sql"])
+
+
+class TimeOffRequestTest(TestCase):
+
+    def setUp(self):
+        User = get_user_model()
+        div = Division.objects.create(name="Widget, Inc.")
+        dept = Dept.objects.create(name="Shipping", division=div)
+        user = User.objects.create(username="al", email="al@gmail.com")
+        self.al = Staff.objects.create(user=user, dept=dept, is_employee=True)
+        self.client.force_login(user)
+        # A Monday a few weeks ahead.
+        soon = datetime.date.today() + datetime.timedelta(days=28)
+        self.day = soon - datetime.timedelta(days=soon.weekday())
+
+    def overlap_constraint_installed(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_constraint WHERE conname = %s",
+                [VACATION_OVERLAP_CONSTRAINT],
+            )
+            return cursor.fetchone() is not None
+
+    def apply(self, day):
+        # One day off, all of it unpaid so no allowance is needed.
+        return self.client.post(
+            reverse("timeoff"),
+            {
+                "start_date_month": day.month,
+                "start_date_day": day.day,
+                "start_date_year": day.year,
+                "end_date_month": day.month,
+                "end_date_day": day.day,
+                "end_date_year": day.year,
+                "unpaid_time": 8,
+                "overtime": 0,
+            },
+        )
+
+    def test_overlapping_request_is_refused(self):
+        self.apply(self.day)
+        response = self.apply(self.day)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            "already either applied", str(list(response.context["messages"])[0])
+        )
+        self.assertEquals(Vacations.objects.filter(name=self.al).count(), 1)
+
+    @skipUnless(
+        connection.vendor == "postgresql", "the overlap constraint is PostgreSQL only"
+    )
+    def test_overlap_constraint_is_refused_like_the_check(self):
+        # Two submissions at once both pass the check; the constraint stops the second.
+        if not self.overlap_constraint_installed():
+            self.skipTest("the vacation overlap migration has not been applied")
+        self.apply(self.day)
+        with mock.patch(
+            "employee_time_management.views.only_apply_for_one_vacation_date",
+            return_value=False,
+        ):
+            response = self.apply(self.day)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            "already either applied", str(list(response.context["messages"])[0])
+        )
+        self.assertEquals(Vacations.objects.filter(name=self.al).count(), 1)
+
+    @skipUnless(
+        connection.vendor == "postgresql", "the overlap constraint is PostgreSQL only"
+    )
+    def test_overlap_migration_lists_existing_overlaps(self):
+        if self.overlap_constraint_installed():
+            # Let the overlaps in, as a database from before the constraint would.
+            connection.check_constraints()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"ALTER TABLE {Vacations._meta.db_table} "
+                    f"DROP CONSTRAINT {VACATION_OVERLAP_CONSTRAINT}"
+                )
+        check_no_overlaps = import_module(
+            "employee_time_management.migrations.0004_vacation_overlap"
+        ).check_no_overlaps
+        schema_editor = mock.Mock(connection=connection)
+        first, second, cancelled = [
+            Vacations.objects.create(
+                name=self.al,
+                dept=self.al.dept,
+                start_date=self.day,
+                end_date=self.day + datetime.timedelta(days=days),
+                status=status,
+            )
+            for days, status in [
+                (0, RequestStatus.PENDING),
+                (1, RequestStatus.APPROVED),
+                (0, RequestStatus.CANCELLED),
+            ]
+        ]
+        with self.assertRaisesMessage(RuntimeError, f": {first.pk}, {second.pk}."):
+            check_no_overlaps(django_apps, schema_editor)
+        Vacations.objects.filter(pk=second.pk).update(status=RequestStatus.DENIED)
+        check_no_overlaps(django_apps, schema_editor)
+
+
+class HolidayTest(TestCase):
+
+    def setUp(self):
+        self.widgets = Division.objects.create(name="Widget, Inc.")
+        self.gadgets = Division.objects.create(name="Gadget, Inc.")
+        # Monday 2024-12-23 to Friday 2025-01-03 is ten weekdays.
+        self.start = datetime.date(2024, 12, 23)
+        self.end = datetime.date(2025, 1, 3)
+        Holiday.objects.create(name="Christmas Day", date=datetime.date(2024, 12, 25))
+        Holiday.objects.create(name="New Year's Day", date=datetime.date(2025, 1, 1))
+        Holiday.objects.create(
+            name="Boxing Day", date=datetime.date(2024, 12, 26), division=self.widgets
+        )
+        Holiday.objects.create(name="Saturday", date=datetime.date(2024, 12, 28))
+
+    def test_holidays_excluded(self):
+        self.assertEquals(vacation_days_used(self.start, self.end), 64)
+        self.assertEquals(vacation_days_used(self.start, self.end, self.widgets.id), 56)
+        self.assertEquals(vacation_days_used(self.start, self.end, self.gadgets.id), 64)
+        self.assertEquals(
+            vacation_days_used_batch(
+                [self.start, self.start], [self.end, self.start], self.widgets.id
+            ),
+            [56, 8],
+        )
+
+    def test_single_holiday(self):
+        christmas = datetime.date(2024, 12, 25)
+        self.assertEquals(vacation_days_used(christmas, christmas), 0)
+
+    def test_calendar_cached_until_changed(self):
+        vacation_days_used(self.start, self.end)
+        with self.assertNumQueries(0):
+            self.assertEquals(vacation_days_used(self.start, self.end), 64)
+        Holiday.objects.create(name="Floater", date=datetime.date(2024, 12, 24))
+        self.assertEquals(vacation_days_used(self.start, self.end), 56)
+
+
+class VacationTierTest(TestCase):
+
+    def setUp(self):
+        User = get_user_model()
+        Allowed_vacation.objects.create(years_employed=3, annual_vacation_hours=120)
+        Allowed_vacation.objects.create(years_employed=1, annual_vacation_hours=80)
+        Allowed_vacation.objects.create(years_employed=10, annual_vacation_hours=160)
+        today = datetime.date.today()
+        self.staff = {}
+        for name, days in [("new", 30), ("one", 400), ("five", 5 * 365 + 10)]:
+            user = User.objects.create(username=name, email=f"{name}@gmail.com")
+            self.staff[name] = Staff.objects.create(
+                user=user, anniversary_date=today - datetime.timedelta(days=days)
+            )
+        user = User.objects.create(username="unknown", email="unknown@gmail.com")
+        self.staff["unknown"] = Staff.objects.create(user=user, anniversary_date=None)
+
+    def test_annual_vacation(self):
+        self.assertEquals(annual_vacation(self.staff["new"]), 0)
+        self.assertEquals(annual_vacation(self.staff["one"]), 80)
+        self.assertEquals(annual_vacation(self.staff["five"]), 120)
+        with self.assertNumQueries(0):
+            self.assertEquals(annual_vacation(self.staff["five"]), 120)
+
+    def test_tiers_reloaded_on_change(self):
+        self.assertEquals(annual_vacation(self.staff["five"]), 120)
+        Allowed_vacation.objects.create(years_employed=5, annual_vacation_hours=140)
+        self.assertEquals(annual_vacation(self.staff["five"]), 140)
+        Allowed_vacation.objects.filter(years_employed=5).get().delete()
+        self.assertEquals(annual_vacation(self.staff["five"]), 120)
+
+    def test_annual_vacations(self):
+        with self.assertNumQueries(2):
+            entitlements = annual_vacations(Staff.objects.all())
+        self.assertEquals(
+            entitlements,
+            {
+                self.staff["new"].pk: 0,
+                self.staff["one"].pk: 80,
+                self.staff["five"].pk: 120,
+                self.staff["unknown"].pk: 0,
+            },
+        )
+
+
+class RollVacationYearsTest(TestCase):
+
+    def setUp(self):
+        User = get_user_model()
+        self.today = datetime.date(2024, 6, 1)
+        self.staff = {}
+        for name, update_on in [
+            ("due", datetime.date(2024, 5, 1)),
+            ("overdue", datetime.date(2022, 2, 28)),
+            ("leap", datetime.date(2024, 2, 29)),
+            ("today", self.today),
+            ("later", datetime.date(2024, 9, 1)),
+        ]:
+            user = User.objects.create(username=name, email=f"{name}@gmail.com")
+            self.staff[name] = Staff.objects.create(
+                user=user, update_on=update_on, vacation_used=40, updated_hours=False
+            )
+
+    def assertRolled(self, name, update_on):
+        staff = Staff.objects.get(pk=self.staff[name].pk)
+        self.assertEquals(staff.update_on, update_on)
+        self.assertEquals(staff.vacation_used, 0)
+        self.assertEquals(staff.updated_hours, True)
+
+    def test_roll_vacation_years(self):
+        self.assertEquals(roll_vacation_years(self.today, chunk_size=2), 4)
+        self.assertRolled("due", datetime.date(2025, 5, 1))
+        self.assertRolled("overdue", datetime.date(2025, 2, 28))
+        self.assertRolled("leap", datetime.date(2025, 2, 28))
+        self.assertRolled("today", datetime.date(2025, 6, 1))
+        later = Staff.objects.get(pk=self.staff["later"].pk)
+        self.assertEquals(later.vacation_used, 40)
+        self.assertEquals(roll_vacation_years(self.today), 0)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command("roll_vacation_years", "--date", "2024-06-01", stdout=out)
+        self.assertIn("Rolled over 4 staff.", out.getvalue())
+        call_command("roll_vacation_years", "--date", "2024-06-01", stdout=out)
+        self.assertIn("Rolled over 0 staff.", out.getvalue())
+
+
+class PayrollExportTest(TestCase):
+
+    def setUp(self):
+        User = get_user_model()
+        div = Division.objects.create(name="Widget, Inc.")
+        dept = Dept.objects.create(name="Shipping", division=div)
+        hr_user = User.objects.create(username="hr", email="hr@gmail.com")
+        hr_user.is_superuser = True
+        hr_user.save()
+        Staff.objects.create(user=hr_user)
+        self.staff = {}
+        for name, unpaid_time in [("al", 16), ("nancy", 4.5), ("bob", 0)]:
+            user = User.objects.create(
+                username=name, email=f"{name}@gmail.com", last_name=name.title()
+            )
+            self.staff[name] = Staff.objects.create(
+                user=user, dept=dept, is_employee=True, unpaid_time=unpaid_time
+            )
+        self.client.force_login(hr_user)
+
+    def unpaid_time(self, name):
+        return Staff.objects.get(pk=self.staff[name].pk).unpaid_time
+
+    def test_export_and_confirm(self):
+        self.client.post(reverse("payroll_export"))
+        export = PayrollExport.objects.get()
+        response = self.client.get(reverse("payroll_csv", args=[export.pk]))
+        self.assertEquals(response["Content-Type"], "text/csv")
+        self.assertEquals(
+            b"".join(response.streaming_content).decode().splitlines(),
+            [
+                "Username,First Name,Last Name,Department,Unpaid Hours",
+                "al,,Al,Shipping,16.0",
+                "nancy,,Nancy,Shipping,4.5",
+            ],
+        )
+
+        # Unpaid time added after the export is kept for the next payroll.
+        staff = self.staff["al"]
+        staff.unpaid_time = 24
+        staff.save()
+        self.client.post(reverse("payroll_confirm", args=[export.pk]))
+        self.assertEquals(self.unpaid_time("al"), 8)
+        self.assertEquals(self.unpaid_time("nancy"), 0)
+        self.assertEquals(self.unpaid_time("bob"), 0)
+
+        self.client.post(reverse("payroll_confirm", args=[export.pk]))
+        self.assertEquals(self.unpaid_time("al"), 8)
+
+    def test_reset_then_confirm(self):
+        self.client.post(reverse("payroll_export"))
+        export = PayrollExport.objects.get()
+        # HR clears Al by hand, then Al takes more unpaid time.
+        self.client.post(reverse("hrinfo"), {"Staff": "al", "unpaid": ""})
+        self.assertEquals(self.unpaid_time("al"), 0)
+        staff = Staff.objects.get(pk=self.staff["al"].pk)
+        staff.unpaid_time = 4
+        staff.save()
+        # Nancy's hours are lowered outside either mechanism.
+        Staff.objects.filter(pk=self.staff["nancy"].pk).update(unpaid_time=2)
+        self.client.post(reverse("payroll_confirm", args=[export.pk]))
+        self.assertEquals(self.unpaid_time("al"), 4)
+        self.assertEquals(self.unpaid_time("nancy"), 0)
+
+    def test_confirm_is_one_update(self):
+        self.client.post(reverse("payroll_export"))
+        export = PayrollExport.objects.get()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEquals(confirm_payroll_export(export), 2)
+        # One update marks the export confirmed, one clears the unpaid time.
+        updates = [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEquals(len(updates), 2)
+
+
+class HistoryExportTest(TestCase):
+
+    def setUp(self):
+        User = get_user_model()
+        div = Division.objects.create(name="Widget, Inc.")
+        self.shipping = Dept.objects.create(name="Shipping", division=div)
+        receiving = Dept.objects.create(name="Receiving", division=div)
+        hr_user = User.objects.create(username="hr", email="hr@gmail.com")
+        self.hr = Staff.objects.create(user=hr_user)
+        boss = User.objects.create(username="boss", email="boss@gmail.com")
+        self.boss = Staff.objects.create(user=boss, dept=self.shipping, is_manager=True)
+        manager = Manager.objects.create(name=self.boss, dept=self.shipping)
+        for name, dept in [("al", self.shipping), ("nancy", receiving)]:
+            user = User.objects.create(
+                username=name, email=f"{name}@gmail.com", first_name=name.title()
+            )
+            staff = Staff.objects.create(user=user, dept=dept, is_employee=True)
+            Vacations.objects.create(
+                name=staff,
+                dept=dept,
+                start_date=datetime.date(2024, 1, 8),
+                end_date=datetime.date(2024, 1, 12),
+                total_hours_away=40,
+                status=RequestStatus.APPROVED,
+            )
+            Overtime.objects.create(
+                name=staff, dept=dept, date=datetime.date(2024, 3, 1), ot_hours=6
+            )
+            SickDays.objects.create(
+                name=staff,
+                dept=dept,
+                date=datetime.date(2023, 5, 2),
+                total_hours_away=8,
+                approved_by=manager,
+            )
+
+    def export(self, kind, **params):
+        response = self.client.get(reverse("history_export", args=[kind]), params)
+        self.assertEquals(response["Content-Type"], "text/csv")
+        return b"".join(response.streaming_content).decode().splitlines()
+
+    def test_exports(self):
+        self.client.force_login(self.hr.user)
+        self.assertEquals(
+            self.export("vacations"),
+            [
+                "Username,First Name,Last Name,Department,Start Date,End Date,"
+                "Hours Away,Unpaid Hours,Overtime Used,Status",
+                "al,Al,,Shipping,2024-01-08,2024-01-12,40.0,0.0,0.0,Approved",
+                "nancy,Nancy,,Receiving,2024-01-08,2024-01-12,40.0,0.0,0.0,Approved",
+            ],
+        )
+        self.assertEquals(
+            self.export("overtime", dept=self.shipping.id)[1:],
+            ["al,Al,,Shipping,2024-03-01,6.0,Pending"],
+        )
+        self.assertEquals(len(self.export("sickdays", start="2024-01-01")), 1)
+        self.assertEquals(
+            len(self.export("vacations", start="2024-01-12", end="2024-01-31")), 3
+        )
+
+    def test_manager_gets_own_department(self):
+        self.client.force_login(self.boss.user)
+        self.assertEquals(
+            self.export("sickdays")[1:], ["al,Al,,Shipping,2023-05-02,8.0,0.0"]
+        )
+
+    def test_export_query_count(self):
+        self.client.force_login(self.hr.user)
+        response = self.client.get(reverse("history_export", args=["vacations"]))
+        with self.assertNumQueries(1):
+            lines = list(response.streaming_content)
+        self.assertEquals(len(lines), 3)
+
+    def test_bad_requests(self):
+        self.client.force_login(self.hr.user)
+        response = self.client.get(
+            reverse("history_export", args=["vacations"]), {"start": "soon"}
+        )
+        self.assertEquals(response.status_code, 400)
+        response = self.client.get(reverse("history_export", args=["expenses"]))
+        self.assertEquals(response.status_code, 404)
+        for dept in ["abc", "-1", "1.5"]:
+            response = self.client.get(
+                reverse("history_export", args=["vacations"]), {"dept": dept}
+            )
+            self.assertEquals(response.status_code, 400)
+
+    def test_manager_without_department_is_refused(self):
+        self.boss.dept = None
+        self.boss.save()
+        self.client.force_login(self.boss.user)
+        response = self.client.get(reverse("history_export", args=["vacations"]))
+        self.assertEquals(response.status_code, 403)
+
+
+def missing_indexes():
+    missing = []
+    for model in [Vacations, Overtime, SickDays]:
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, model._meta.db_table
+            )
+        missing += [i.name for i in model._meta.indexes if i.name not in constraints]
+    return missing
+
+
+class IndexTest(TestCase):
+    def test_indexes_exist(self):
+        self.assertEquals(missing_indexes(), [])
+
+    def test_seed_company(self):
+        counts = seed_company(
+            divisions=1,
+            depts_per_division=2,
+            staff_per_dept=3,
+            vacations_per_staff=2,
+            overtime_per_staff=2,
+            sick_days_per_staff=1,
+            prefix="t",
+        )
+        self.assertEquals(counts["staff"], 8)
+        self.assertEquals(Manager.objects.count(), 2)
+        self.assertEquals(Vacations.objects.count(), 12)
+        self.assertEquals(Overtime.objects.count(), 12)
+        self.assertEquals(SickDays.objects.count(), 6)
+        self.assertEquals(
+            DeptOccupancy.objects.aggregate(Sum("off_sick"))["off_sick__sum"], 6
+        )
+
+
+class BenchmarkIndexesTest(TransactionTestCase):
+    # The command drops and recreates indexes, which SQLite cannot do inside the
+    # transaction a TestCase wraps around each test.
+    def test_benchmark_command(self):
+        out = io.StringIO()
+        call_command(
+            "benchmark_indexes",
+            "--divisions",
+            "1",
+            "--depts-per-division",
+            "2",
+            "--staff-per-dept",
+            "3",
+            "--repeat",
+            "1",
+            stdout=out,
+        )
+        self.assertIn("== Summary", out.getvalue())
+        self.assertFalse(Dept.objects.exists())
+        self.assertFalse(get_user_model().objects.exists())
+        self.assertEquals(missing_indexes(), [])
+
+
+class BenchmarkCompanyTest(TestCase):
+    def test_benchmark_command(self):
+        out = io.StringIO()
+        call_command(
+            "benchmark_company",
+            "--divisions",
+            "1",
+            "--depts-per-division",
+            "2",
+            "--staff-per-dept",
+            "3",
+            "--repeat",
+            "2",
+            stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertEquals(report["company"]["staff"], 8)
+        views = [r for r in report["results"] if r["kind"] == "view"]
+        self.assertEquals({r["status"] for r in views}, {200})
+        self.assertEquals(
+            [r["name"] for r in report["results"] if r["kind"] == "util"],
+            [
+                "list_of_conflicing_dates",
+                "annual_vacation",
+                "vacation_days_used",
+            ],
+        )
+        for result in report["results"]:
+            self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+            self.assertGreater(result["peak_memory_kb"], 0)
+        self.assertFalse(Dept.objects.exists())
+        self.assertFalse(get_user_model().objects.exists())
+        self.assertFalse(PayrollExport.objects.exists())
+
+
+class RequestStatusTest(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        div = Division.objects.create(name="Widget, Inc.")
+        self.dept = Dept.objects.create(name="Shipping", division=div)
+        boss = User.objects.create(username="boss", email="boss@gmail.com")
+        self.boss = Staff.objects.create(user=boss, dept=self.dept, is_manager=True)
+        Manager.objects.create(name=self.boss, dept=self.dept)
+        user = User.objects.create(username="al", email="al@gmail.com")
+        self.al = Staff.objects.create(user=user, dept=self.dept, is_employee=True)
+        self.vacations = {
+            status: Vacations.objects.create(
+                name=self.al,
+                dept=self.dept,
+                start_date=datetime.date(2024, 1, 8) + datetime.timedelta(weeks=i),
+                end_date=datetime.date(2024, 1, 12) + datetime.timedelta(weeks=i),
+                total_hours_away=40,
+                status=status,
+            )
+            for i, status in enumerate(RequestStatus.values)
+        }
+        for i, status in enumerate(RequestStatus.values):
+            Overtime.objects.create(
+                name=self.al,
+                dept=self.dept,
+                date=datetime.date(2024, 3, 1) + datetime.timedelta(days=i),
+                ot_hours=6,
+                status=status,
+            )
+
+    def test_queues_only_show_pending(self):
+        self.client.force_login(self.boss.user)
+        response = self.client.get(reverse("approve_timeoff"))
+        self.assertEquals(
+            [v for v, _ in response.context["vacations_with_conflicts"]],
+            [self.vacations[RequestStatus.PENDING]],
+        )
+        response = self.client.get(reverse("approve_overtime"))
+        self.assertEquals(
+            [o.status for o in response.context["unapproved_overtime"]],
+            [RequestStatus.PENDING],
+        )
+
+    def test_approve_and_deny(self):
+        self.client.force_login(self.boss.user)
+        pending = self.vacations[RequestStatus.PENDING]
+        self.client.post(reverse("approve_timeoff"), {"csrf": "", str(pending.id): ""})
+        pending.refresh_from_db()
+        self.assertEquals(pending.status, RequestStatus.APPROVED)
+        response = self.client.post(
+            reverse("approve_timeoff"), {"csrf": "", f"Deny {pending.id}": ""}
+        )
+        pending.refresh_from_db()
+        self.assertEquals(pending.status, RequestStatus.APPROVED)
+        response = self.client.get(response.url)
+        self.assertContains(response, "This request has already been decided.")
+
+    def test_cancelled_vacation_does_not_block_new_request(self):
+        cancelled = self.vacations[RequestStatus.CANCELLED]
+        live = Vacations.objects.filter(name=self.al).filter(
+            status__in=[RequestStatus.PENDING, RequestStatus.APPROVED]
+        )
+        self.assertFalse(
+            only_apply_for_one_vacation_date(
+                cancelled.start_date, cancelled.end_date, live
+            )
+        )
+
+
+class RequestStatusMigrationTest(TransactionTestCase):
+    # Requests as they were stored before the status column, as (submitted,
+    # approved, denied), and the status each is given.
+    OLD_VALUES = {
+        RequestStatus.PENDING: (True, False, False),
+        RequestStatus.APPROVED: (True, True, False),
+        RequestStatus.DENIED: (True, False, True),
+        RequestStatus.CANCELLED: (False, False, False),
+    }
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.migrate([("employee_time_management", target)])
+        return executor.loader.project_state(("employee_time_management", target)).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_status_filled_from_old_columns(self):
+        apps = self.migrate("0001_initial")
+        user = apps.get_model(*settings.AUTH_USER_MODEL.split(".")).objects.create(
+            username="al"
+        )
+        div = apps.get_model("employee_time_management", "Division").objects.create(
+            name="Widget, Inc."
+        )
+        dept = apps.get_model("employee_time_management", "Dept").objects.create(
+            name="Shipping", division=div
+        )
+        al = apps.get_model("employee_time_management", "Staff").objects.create(
+            user=user, dept=dept
+        )
+        ids = {}
+        for i, (status, values) in enumerate(self.OLD_VALUES.items()):
+            columns = dict(
+                zip(["request_submitted", "request_approved", "request_denied"], values)
+            )
+            day = datetime.date(2024, 1, 8) + datetime.timedelta(weeks=i)
+            ids[status] = (
+                apps.get_model("employee_time_management", "Vacations")
+                .objects.create(
+                    name=al, dept=dept, start_date=day, end_date=day, **columns
+                )
+                .pk,
+                apps.get_model("employee_time_management", "Overtime")
+                .objects.create(name=al, dept=dept, date=day, **columns)
+                .pk,
+            )
+
+        apps = self.migrate("0002_request_status")
+        for status, (vacation_id, overtime_id) in ids.items():
+            for name, pk in [("Vacations", vacation_id), ("Overtime", overtime_id)]:
+                model = apps.get_model("employee_time_management", name)
+                self.assertEquals(model.objects.get(pk=pk).status, status)
+
+        # Going back restores the old columns from the status.
+        apps = self.migrate("0001_initial")
+        for status, (vacation_id, overtime_id) in ids.items():
+            for name, pk in [("Vacations", vacation_id), ("Overtime", overtime_id)]:
+                model = apps.get_model("employee_time_management", name)
+                self.assertEquals(
+                    model.objects.values_list(
+                        "request_submitted", "request_approved", "request_denied"
+                    ).get(pk=pk),
+                    self.OLD_VALUES[status],
+                )
+
+
+class ApprovalTest(ApprovalTestCase):
+    employees = 1
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.al = cls.staff[0]
+
+    def test_approval_adds_to_totals(self):
+        first = add_vacation(self.al, total_hours_away=24, hours_unpaid=8)
+        second = add_vacation(self.al, week=1)
+        self.assertEquals(approve_vacation(first.id, self.dept), first)
+        self.assertEquals(approve_vacation(second.id, self.dept), second)
+        self.al.refresh_from_db()
+        self.assertEquals(self.al.vacation_used, 16 + 24 + 40)
+        self.assertEquals(self.al.unpaid_time, 4 + 8)
+        self.assertEquals(
+            DeptOccupancy.objects.get(date=first.start_date).on_vacation, 1
+        )
+
+    def test_deny_returns_overtime(self):
+        vacation = add_vacation(self.al, total_hours_away=30, overtime=10)
+        self.assertEquals(deny_vacation(vacation.id, self.dept), vacation)
+        self.al.refresh_from_db()
+        self.assertEquals(self.al.overtime_hours, 12)
+        self.assertEquals(self.al.vacation_used, 16)
+        self.assertFalse(DeptOccupancy.objects.exists())
+
+    def test_only_pending_requests_in_dept_are_decided(self):
+        vacation = add_vacation(self.al)
+        other = Dept.objects.create(name="Receiving", division=self.dept.division)
+        self.assertIsNone(approve_vacation(vacation.id, other))
+        self.assertIsNotNone(approve_vacation(vacation.id, self.dept))
+        self.assertIsNone(approve_vacation(vacation.id, self.dept))
+        self.assertIsNone(deny_vacation(vacation.id, self.dept))
+        self.al.refresh_from_db()
+        self.assertEquals(self.al.vacation_used, 56)
+
+    def test_approval_query_count(self):
+        vacation = add_vacation(self.al)
+        with CaptureQueriesContext(connection) as queries:
+            approve_vacation(vacation.id, self.dept)
+        statements = [
+            q["sql"].split()[0]
+            for q in queries
+            if not q["sql"].startswith(("SAVEPOINT", "RELEASE"))
+        ]
+        # Lock the request, update the employee and the request, record the
+        # occupancy with one insert and one update, move the department's
+        # calendar on, and queue the notice.
+        self.assertEquals(
+            sorted(statements),
+            ["INSERT", "INSERT", "SELECT", "UPDATE", "UPDATE", "UPDATE", "UPDATE"],
+        )
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ApprovalConcurrencyTest(TransactionTestCase):
+    def run_in_threads(self, functions):
+        barrier = threading.Barrier(len(functions))
+        results = []
+        errors = []
+
+        def worker(function):
+            try:
+                barrier.wait()
+                results.append(function())
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(f,)) for f in functions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(errors, [])
+        return results
+
+    def test_request_is_decided_once(self):
+        dept, (al,) = make_approval_fixture(1)
+        vacation = add_vacation(al, overtime=8)
+        results = self.run_in_threads(
+            [lambda: approve_vacation(vacation.id, dept)] * 4
+            + [lambda: deny_vacation(vacation.id, dept)] * 4
+        )
+        self.assertEquals(len([r for r in results if r is not None]), 1)
+        vacation.refresh_from_db()
+        al.refresh_from_db()
+        if vacation.status == RequestStatus.APPROVED:
+            self.assertEquals((al.vacation_used, al.overtime_hours), (56, 2))
+        else:
+            self.assertEquals((al.vacation_used, al.overtime_hours), (16, 10))
+
+    def test_concurrent_approvals_add_up(self):
+        dept, staff = make_approval_fixture(5)
+        al = staff[0]
+        vacations = [add_vacation(al, week=week) for week in range(4)]
+        vacations += [add_vacation(other) for other in staff[1:]]
+        self.run_in_threads(
+            [lambda v=v: approve_vacation(v.id, dept) for v in vacations]
+        )
+        al.refresh_from_db()
+        self.assertEquals(al.vacation_used, 16 + 4 * 40)
+        self.assertEquals(
+            DeptOccupancy.objects.get(date=datetime.date(2024, 1, 8)).on_vacation, 5
+        )
+        self.assertEquals(
+            DeptOccupancy.objects.get(date=datetime.date(2024, 1, 15)).on_vacation, 1
+        )
+
+
+class BulkDecisionTest(ApprovalTestCase):
+    employees = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Four employees and at least two at work: two can be off at once.
+        cls.dept.min_staff = 2
+        cls.dept.save()
+
+    def updates(self, function):
+        with CaptureQueriesContext(connection) as queries:
+            result = function()
+        return result, [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+
+    def test_bulk_approve_within_capacity(self):
+        al = self.staff[0]
+        vacations = [
+            add_vacation(al, hours_unpaid=8),
+            add_vacation(al, week=1),
+            add_vacation(self.staff[1]),
+        ]
+        (approved, conflicts), updates = self.updates(
+            lambda: approve_vacations([v.id for v in vacations], self.dept, 2)
+        )
+        self.assertEquals((len(approved), conflicts), (3, []))
+        # Statuses, balances, occupancy for 2 staff off in week one and 1 in week
+        # two, and the department's calendar version.
+        self.assertEquals(len(updates), 5)
+        al.refresh_from_db()
+        self.assertEquals((al.vacation_used, al.unpaid_time), (96, 12))
+        self.staff[1].refresh_from_db()
+        self.assertEquals(self.staff[1].vacation_used, 56)
+        self.assertEquals(
+            set(Vacations.objects.values_list("status", flat=True)),
+            {RequestStatus.APPROVED},
+        )
+        occupancy = dict(DeptOccupancy.objects.values_list("date", "on_vacation"))
+        self.assertEquals(occupancy[datetime.date(2024, 1, 8)], 2)
+        self.assertEquals(occupancy[datetime.date(2024, 1, 15)], 1)
+
+    def test_bulk_approve_over_capacity_approves_nothing(self):
+        approve_vacation(add_vacation(self.staff[0]).id, self.dept)
+        first = add_vacation(self.staff[1])
+        second = add_vacation(self.staff[2], week=0)
+        second.start_date = datetime.date(2024, 1, 11)
+        second.save()
+        # Either request fits on its own, but not both together.
+        approved, conflicts = approve_vacations([first.id, second.id], self.dept, 2)
+        self.assertEquals(approved, [])
+        self.assertEquals(
+            conflicts, [datetime.date(2024, 1, 11), datetime.date(2024, 1, 12)]
+        )
+        self.assertEquals(
+            Vacations.objects.filter(status=RequestStatus.PENDING).count(), 2
+        )
+        self.assertEquals(len(approve_vacations([first.id], self.dept, 2)[0]), 1)
+
+    def test_bulk_approve_reads_occupancy(self):
+        # Two staff are already off on January 10, however that was recorded.
+        DeptOccupancy.objects.create(
+            dept=self.dept, date=datetime.date(2024, 1, 10), on_vacation=2
+        )
+        vacation = add_vacation(self.staff[0])
+        approved, conflicts = approve_vacations([vacation.id], self.dept, 2)
+        self.assertEquals((approved, conflicts), ([], [datetime.date(2024, 1, 10)]))
+        DeptOccupancy.objects.update(on_vacation=1)
+        self.assertEquals(len(approve_vacations([vacation.id], self.dept, 2)[0]), 1)
+
+    def test_approval_page_conflicts(self):
+        # Two staff off from January 8 to 12 fill the department. The vacation a
+        # week earlier is outside the pending request and is not read at all.
+        for staff in self.staff[:2]:
+            approve_vacation(add_vacation(staff).id, self.dept)
+        approve_vacation(add_vacation(self.staff[2], week=-1).id, self.dept)
+        pending = add_vacation(self.staff[3])
+        pending.start_date = datetime.date(2024, 1, 12)
+        pending.end_date = datetime.date(2024, 1, 16)
+        pending.save()
+        self.client.force_login(self.boss.user)
+        response = self.client.get(reverse("approve_timeoff"))
+        self.assertEquals(
+            response.context["vacations_with_conflicts"],
+            [(pending, [datetime.date(2024, 1, 12)])],
+        )
+
+    def test_bulk_deny_returns_overtime(self):
+        vacations = [add_vacation(s, overtime=4) for s in self.staff[:3]]
+        vacations.append(add_vacation(self.staff[0], week=1, overtime=6))
+        denied, updates = self.updates(
+            lambda: deny_vacations([v.id for v in vacations], self.dept)
+        )
+        self.assertEquals(len(denied), 4)
+        self.assertEquals(len(updates), 2)
+        self.assertEquals(
+            list(
+                Staff.objects.filter(dept=self.dept, is_employee=True)
+                .order_by("pk")
+                .values_list("overtime_hours", flat=True)
+            ),
+            [12, 6, 6, 2],
+        )
+
+    def test_bulk_overtime(self):
+        requests = [
+            Overtime.objects.create(
+                name=staff,
+                dept=self.dept,
+                date=datetime.date(2024, 3, day),
+                ot_hours=3,
+            )
+            for day, staff in enumerate([*self.staff, self.staff[0]], start=1)
+        ]
+        approved, updates = self.updates(
+            lambda: decide_overtime(
+                [o.id for o in requests], self.dept, RequestStatus.APPROVED
+            )
+        )
+        self.assertEquals(len(approved), 5)
+        self.assertEquals(len(updates), 2)
+        self.staff[0].refresh_from_db()
+        self.assertEquals(self.staff[0].overtime_hours, 8)
+        self.assertEquals(
+            decide_overtime([requests[0].id], self.dept, RequestStatus.DENIED), []
+        )
+
+    def test_bulk_views(self):
+        self.client.force_login(self.boss.user)
+        vacations = [add_vacation(s) for s in self.staff[:3]]
+        response = self.client.post(
+            reverse("approve_timeoff"),
+            {"bulk": "approve", "selected": [v.id for v in vacations]},
+            follow=True,
+        )
+        self.assertContains(response, "Nothing was approved.")
+        response = self.client.post(
+            reverse("approve_timeoff"),
+            {"bulk": "approve", "selected": [v.id for v in vacations[:2]]},
+            follow=True,
+        )
+        self.assertContains(response, "Approved 2 time off requests.")
+        self.assertContains(response, 'name="selected" value="%d"' % vacations[2].id)
+
+        overtime = Overtime.objects.create(
+            name=self.staff[0], dept=self.dept, date=datetime.date(2024, 3, 1)
+        )
+        response = self.client.post(
+            reverse("approve_overtime"),
+            {"bulk": "deny", "selected": [overtime.id, "junk"]},
+            follow=True,
+        )
+        self.assertContains(response, "Denied 1 overtime requests.")
+        overtime.refresh_from_db()
+        self.assertEquals(overtime.status, RequestStatus.DENIED)
+
+
+class FlakyEmailBackend(EmailBackend):
+    # A locmem backend that counts its connections and rejects some addresses.
+    opened = 0
+
+    def __init__(self, fail_for=(), **kwargs):
+        super().__init__(**kwargs)
+        self.fail_for = set(fail_for)
+
+    def open(self):
+        FlakyEmailBackend.opened += 1
+
+    def send_messages(self, messages):
+        for message in messages:
+            if set(message.to) & self.fail_for:
+                raise ConnectionError("Mailbox unavailable")
+        return super().send_messages(messages)
+
+
+class OutboxTest(TestCase):
+    def setUp(self):
+        FlakyEmailBackend.opened = 0
+        for i in range(5):
+            queue_email(f"emp{i}@gmail.com", f"Hello {i}", "Welcome aboard.")
+
+    def test_sends_in_batches_over_one_connection(self):
+        backend = FlakyEmailBackend()
+        self.assertEquals(send_outbox(batch_size=3, connection=backend), (3, 0))
+        self.assertEquals(FlakyEmailBackend.opened, 1)
+        self.assertEquals(
+            [m.subject for m in mail.outbox], ["Hello 0", "Hello 1", "Hello 2"]
+        )
+        self.assertEquals(send_outbox(batch_size=3, connection=backend), (2, 0))
+        self.assertEquals(send_outbox(batch_size=3, connection=backend), (0, 0))
+        self.assertFalse(OutboxEmail.objects.filter(sent_at__isnull=True).exists())
+
+    def test_failures_back_off_and_give_up(self):
+        backend = FlakyEmailBackend(fail_for={"emp1@gmail.com"})
+        self.assertEquals(send_outbox(connection=backend), (4, 1))
+        failed = OutboxEmail.objects.get(to="emp1@gmail.com")
+        self.assertEquals(failed.attempts, 1)
+        self.assertIsNone(failed.sent_at)
+        self.assertIn("Mailbox unavailable", failed.last_error)
+        self.assertGreater(
+            failed.send_after,
+            timezone.now() + datetime.timedelta(seconds=OUTBOX_RETRY_SECONDS - 5),
+        )
+        # Not due again until the backoff has passed.
+        self.assertEquals(send_outbox(connection=backend), (0, 0))
+
+        for attempt in range(2, 4):
+            OutboxEmail.objects.update(send_after=timezone.now())
+            self.assertEquals(send_outbox(max_attempts=3, connection=backend), (0, 1))
+            failed.refresh_from_db()
+            self.assertEquals(failed.attempts, attempt)
+        OutboxEmail.objects.update(send_after=timezone.now())
+        self.assertEquals(send_outbox(max_attempts=3, connection=backend), (0, 0))
+
+    def test_connection_failure_retries_whole_batch(self):
+        class DownBackend(EmailBackend):
+            def open(self):
+                raise ConnectionError("Provider down")
+
+        self.assertEquals(send_outbox(connection=DownBackend()), (0, 5))
+        self.assertEquals(mail.outbox, [])
+        self.assertEquals(
+            set(OutboxEmail.objects.values_list("attempts", flat=True)), {1}
+        )
+
+    def test_command_drains_outbox(self):
+        out = io.StringIO()
+        call_command("send_outbox", "--batch-size", "2", stdout=out)
+        self.assertIn("Sent 5 emails, 0 failed.", out.getvalue())
+        self.assertEquals(len(mail.outbox), 5)
+
+
+class DecisionNoticeTest(ApprovalTestCase):
+    employees = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for i, staff in enumerate(cls.staff):
+            staff.user.first_name = f"Emp{i}"
+            staff.user.save()
+
+    def test_digest_per_employee(self):
+        al, bo, _ = self.staff
+        approve_vacations([add_vacation(al).id, add_vacation(bo).id], self.dept)
+        deny_vacation(add_vacation(al, week=1).id, self.dept)
+        overtime = Overtime.objects.create(
+            name=al, dept=self.dept, date=datetime.date(2024, 3, 1), ot_hours=4.5
+        )
+        decide_overtime([overtime.id], self.dept, RequestStatus.APPROVED)
+        self.assertEquals(DecisionNotice.objects.count(), 4)
+        # Deciding only queues the notices.
+        self.assertEquals(mail.outbox, [])
+
+        sent = []
+
+        class CountingBackend(EmailBackend):
+            def send_messages(self, messages):
+                sent.append(len(messages))
+                return super().send_messages(messages)
+
+        self.assertEquals(send_decision_notices(connection=CountingBackend()), 2)
+        self.assertEquals(sent, [2])
+        digests = {m.to[0]: m.body for m in mail.outbox}
+        self.assertEquals(
+            digests["emp0@gmail.com"].splitlines()[4:7],
+            [
+                "- Vacation from 2024-01-08 to 2024-01-12: Approved",
+                "- Vacation from 2024-01-15 to 2024-01-19: Denied",
+                "- Overtime on 2024-03-01 (4.5 hours): Approved",
+            ],
+        )
+        self.assertIn("Hi Emp1,", digests["emp1@gmail.com"])
+
+        self.assertEquals(send_decision_notices(), 0)
+        self.assertEquals(len(mail.outbox), 2)
+
+    def test_failed_send_keeps_notices(self):
+        approve_vacation(add_vacation(self.staff[0]).id, self.dept)
+
+        class DownBackend(EmailBackend):
+            def send_messages(self, messages):
+                raise ConnectionError("Provider down")
+
+        with self.assertRaises(ConnectionError):
+            send_decision_notices(connection=DownBackend())
+        self.assertTrue(DecisionNotice.objects.filter(sent_at__isnull=True).exists())
+        out = io.StringIO()
+        call_command("send_decision_notices", stdout=out)
+        self.assertIn("Sent 1 digest emails.", out.getvalue())
+
+
+class EmployeeApiTest(ApprovalTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.al = cls.staff[0]
+
+    def setUp(self):
+        self.client.force_login(self.al.user)
+
+    def get(self, url, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, headers=headers)
+        selects = [q for q in queries if q["sql"].startswith("SELECT")]
+        return response, len(selects)
+
+    def test_balance(self):
+        Allowed_vacation.objects.create(years_employed=0, annual_vacation_hours=80)
+        response, _ = self.get(reverse("api_balance"))
+        self.assertEquals(
+            response.json(),
+            {
+                "full_name": "",
+                "allowed_hours": 80,
+                "vacation_used": 16,
+                "overtime": 2,
+                "total_hours_available": 66,
+            },
+        )
+
+    def test_conditional_get(self):
+        url = reverse("api_balance")
+        response, _ = self.get(url)
+        etag = response["ETag"]
+        last_modified = response["Last-Modified"]
+
+        response, selects = self.get(url, if_none_match=etag)
+        self.assertEquals(response.status_code, 304)
+        # The session, the user and the Staff row.
+        self.assertEquals(selects, 3)
+        response, _ = self.get(url, if_modified_since=last_modified)
+        self.assertEquals(response.status_code, 304)
+
+        # Another employee's approval leaves this one's tag alone.
+        approve_vacation(add_vacation(self.staff[1]).id, self.dept)
+        response, _ = self.get(url, if_none_match=etag)
+        self.assertEquals(response.status_code, 304)
+
+        approve_vacation(add_vacation(self.al).id, self.dept)
+        response, _ = self.get(url, if_none_match=etag)
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.json()["vacation_used"], 16 + 40)
+        self.assertNotEquals(response["ETag"], etag)
+
+    def test_version_moves_on_every_change(self):
+        def version():
+            return Staff.objects.get(pk=self.al.pk).version
+
+        today = datetime.date.today()
+        # A Monday a few weeks ahead.
+        soon = today + datetime.timedelta(days=28 - today.weekday())
+        seen = [version()]
+        self.client.post(
+            reverse("timeoff"),
+            {
+                "start_date_month": soon.month,
+                "start_date_day": soon.day,
+                "start_date_year": soon.year,
+                "end_date_month": soon.month,
+                "end_date_day": soon.day,
+                "end_date_year": soon.year,
+                "unpaid_time": 6,
+                "overtime": 2,
+            },
+        )
+        seen.append(version())
+        deny_vacation(Vacations.objects.get(name=self.al).id, self.dept)
+        seen.append(version())
+        self.client.post(
+            reverse("overtime"),
+            {
+                "ot_date_month": today.month,
+                "ot_date_day": today.day,
+                "ot_date_year": today.year,
+                "hours": 10,
+            },
+        )
+        seen.append(version())
+        decide_overtime(
+            [Overtime.objects.get(name=self.al).id], self.dept, RequestStatus.DENIED
+        )
+        seen.append(version())
+        update_vacations(Staff.objects.get(pk=self.al.pk), datetime.date(2100, 1, 1))
+        seen.append(version())
+        AllowedVacationAdmin(Allowed_vacation, admin.site).save_model(
+            None,
+            Allowed_vacation(years_employed=0, annual_vacation_hours=80),
+            None,
+            False,
+        )
+        seen.append(version())
+        self.assertEquals(seen, sorted(set(seen)))
+        # Other edits are left to the code that makes them.
+        Staff.objects.filter(pk=self.al.pk).update(unpaid_time=0)
+        self.assertEquals(version(), seen[-1])
+
+    def test_pages(self):
+        for week in range(5):
+            add_vacation(self.al, week=week)
+        approve_vacation(add_vacation(self.al, week=9).id, self.dept)
+        add_vacation(self.staff[1])
+
+        url = reverse("api_requests", args=["vacations"])
+        starts, cursor = [], ""
+        while True:
+            response, selects = self.get(f"{url}?limit=2&cursor={cursor}")
+            page = response.json()
+            starts += [row["start_date"] for row in page["results"]]
+            self.assertEquals(selects, 4)
+            cursor = page["next"]
+            if not cursor:
+                break
+        self.assertEquals(
+            starts,
+            [
+                str(datetime.date(2024, 1, 8) + datetime.timedelta(weeks=week))
+                for week in [9, 4, 3, 2, 1, 0]
+            ],
+        )
+
+        response, _ = self.get(f"{url}?status=approved")
+        self.assertEquals(
+            [row["status"] for row in response.json()["results"]], ["approved"]
+        )
+        for query in ["status=lost", "cursor=nonsense", "limit=0"]:
+            response, _ = self.get(f"{url}?{query}")
+            self.assertEquals(response.status_code, 400)
+        response, _ = self.get(reverse("api_requests", args=["sickdays"]))
+        self.assertEquals(response.status_code, 404)
+
+    def test_overtime(self):
+        Overtime.objects.create(
+            name=self.al, dept=self.dept, date=datetime.date(2024, 3, 1), ot_hours=4.5
+        )
+        response, _ = self.get(reverse("api_requests", args=["overtime"]))
+        self.assertEquals(response.json()["results"][0]["date"], "2024-03-01")
+        self.assertEquals(response.json()["next"], None)
+
+
+class DeptCalendarTest(ApprovalTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.al, cls.bo = cls.staff
+        cls.al.user.first_name, cls.al.user.last_name = "Al", "Jones"
+        cls.al.user.save()
+        cls.today = datetime.date.today()
+        cls.url = reverse("dept_calendar", args=[dept_calendar_token(cls.dept)])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_manager_gets_one_url(self):
+        self.client.force_login(self.manager.name.user)
+        response = self.client.get(reverse("approve_timeoff"))
+        self.assertContains(response, self.url)
+        self.dept.refresh_from_db()
+        self.assertEquals(dept_calendar_token(self.dept), self.url.split("/")[-1][:-4])
+
+    def test_feed(self):
+        week = datetime.timedelta(days=7)
+        start = self.today + week
+        approved = add_vacation(self.al, status=RequestStatus.APPROVED)
+        Vacations.objects.filter(pk=approved.pk).update(
+            start_date=start, end_date=start + datetime.timedelta(days=4)
+        )
+        add_vacation(self.bo)
+        Vacations.objects.create(
+            name=self.al,
+            dept=self.dept,
+            start_date=self.today - 52 * week,
+            end_date=self.today - 52 * week,
+            status=RequestStatus.APPROVED,
+        )
+        SickDays.objects.create(
+            name=self.bo,
+            dept=self.dept,
+            date=self.today,
+            total_hours_away=8,
+            approved_by=self.manager,
+        )
+        LeaveOfAbsense.objects.create(
+            name=self.al,
+            date=self.today,
+            start_date=start + 2 * week,
+            end_date=start + 6 * week,
+            total_hours_away=200,
+            unpaid=True,
+            approved_by=self.manager,
+        )
+        other = Dept.objects.create(name="Receiving", division=self.dept.division)
+        SickDays.objects.create(
+            name=self.al,
+            dept=other,
+            date=self.today,
+            total_hours_away=8,
+            approved_by=self.manager,
+        )
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEquals(response["Content-Type"], "text/calendar; charset=utf-8")
+        body = response.content.decode()
+        self.assertTrue(body.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertEquals(
+            [line for line in body.split("\r\n") if line.startswith("SUMMARY")],
+            [
+                "SUMMARY:emp1: Sick",
+                "SUMMARY:Al Jones: Vacation",
+                "SUMMARY:Al Jones: Leave of absence",
+            ],
+        )
+        self.assertIn(f"DTSTART;VALUE=DATE:{start:%Y%m%d}\r\n", body)
+        self.assertIn(
+            f"DTEND;VALUE=DATE:{start + datetime.timedelta(days=5):%Y%m%d}\r\n", body
+        )
+
+    def test_conditional_get_and_cache(self):
+        response = self.client.get(self.url)
+        etag = response["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, headers={"if_none_match": etag})
+        self.assertEquals(response.status_code, 304)
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.url, headers={"if_modified_since": response["Last-Modified"]}
+            )
+        self.assertEquals(response.status_code, 304)
+        with self.assertNumQueries(1):
+            self.assertEquals(self.client.get(self.url).status_code, 200)
+
+        approve_vacation(add_vacation(self.al).id, self.dept)
+        response = self.client.get(self.url, headers={"if_none_match": etag})
+        self.assertEquals(response.status_code, 200)
+        self.assertNotEquals(response["ETag"], etag)
+
+    @contextlib.contextmanager
+    def assertCalendarMoves(self, moves, dept=None):
+        # Checks whether the department's calendar version moves on in the block.
+        dept = dept or self.dept
+        before = Dept.objects.get(pk=dept.pk).calendar_version
+        yield
+        after = Dept.objects.get(pk=dept.pk).calendar_version
+        if moves:
+            self.assertGreater(after, before)
+        else:
+            self.assertEquals(after, before)
+
+    def test_version_moves_only_for_shown_changes(self):
+        with self.assertCalendarMoves(False):
+            pending = add_vacation(self.al)
+        with self.assertCalendarMoves(False):
+            pending.total_hours_away = 32
+            pending.save()
+        with self.assertCalendarMoves(False):
+            deny_vacation(add_vacation(self.bo, week=1).id, self.dept)
+        with self.assertCalendarMoves(True):
+            approve_vacation(pending.id, self.dept)
+        pending.refresh_from_db()
+        with self.assertCalendarMoves(False):
+            pending.total_hours_away = 40
+            pending.save()
+        with self.assertCalendarMoves(True):
+            pending.end_date -= datetime.timedelta(days=1)
+            pending.save()
+        with self.assertCalendarMoves(True):
+            pending.delete()
+        with self.assertCalendarMoves(False):
+            add_vacation(self.al).delete()
+        with self.assertCalendarMoves(True):
+            SickDays.objects.create(
+                name=self.bo,
+                dept=self.dept,
+                date=self.today,
+                total_hours_away=8,
+                approved_by=self.manager,
+            )
+        with self.assertCalendarMoves(False):
+            self.client.force_login(self.al.user)
+        with self.assertCalendarMoves(False):
+            self.al.unpaid_time = 8
+            self.al.save()
+        with self.assertCalendarMoves(True):
+            self.al.user.first_name = "Alan"
+            CustomUserAdmin(get_user_model(), admin.site).save_model(
+                None, self.al.user, mock.Mock(changed_data=["first_name"]), True
+            )
+        other = Dept.objects.create(name="Receiving", division=self.dept.division)
+        with self.assertCalendarMoves(True), self.assertCalendarMoves(True, other):
+            self.al.dept = other
+            StaffAdmin(Staff, admin.site).save_model(
+                None,
+                self.al,
+                mock.Mock(changed_data=["dept"], initial={"dept": self.dept.pk}),
+                True,
+            )
+
+    def test_unknown_token(self):
+        self.assertEquals(self.client.get("/calendar/nope.ics").status_code, 404)
+
+    def test_long_lines_are_folded(self):
+        line = _ical_line("SUMMARY:" + "é" * 60)
+        parts = line.split("\r\n")
+        self.assertTrue(all(len(part.encode()) <= 75 for part in parts))
+        self.assertEquals(
+            parts[0] + "".join(p[1:] for p in parts[1:]), "SUMMARY:" + "é" * 60
+        )
+
+
+class AdminQueryBudgetTest(TestCase):
+    # Queries each model's changelist and change form may make, however many
+    # rows there are. Both include the session and user lookups.
+    BUDGETS = {
+        Division: (6, 4),
+        Holiday: (7, 5),
+        Dept: (7, 5),
+        Staff: (8, 7),
+        Manager: (6, 6),
+        Owner: (6, 5),
+        Vacations: (7, 7),
+        Overtime: (7, 7),
+        SickDays: (8, 7),
+        LeaveOfAbsense: (7, 6),
+        DeptOccupancy: (7, 5),
+        PayrollExport: (6, 5),
+    }
+
+    def setUp(self):
+        User = get_user_model()
+        self.admin = User.objects.create(
+            username="admin", is_staff=True, is_superuser=True
+        )
+        self.division = Division.objects.create(name="Widget, Inc.")
+        self.batches = 0
+        self.add_rows()
+
+    def add_rows(self):
+        User = get_user_model()
+        i = self.batches = self.batches + 1
+        dept = Dept.objects.create(name=f"Dept {i}", division=self.division)
+        title = JobTitle.objects.create(title=f"Title {i}")
+        people = []
+        for role in ["boss", "owner", "emp", "temp"]:
+            user = User.objects.create(username=f"{role}{i}", first_name=role)
+            people.append(Staff.objects.create(user=user, dept=dept, job_title=title))
+        boss, owner, *employees = people
+        manager = Manager.objects.create(name=boss, dept=dept)
+        Owner.objects.create(name=owner)
+        day = datetime.date(2024, 1, 1) + datetime.timedelta(days=i)
+        Holiday.objects.create(name=f"Holiday {i}", date=day, division=self.division)
+        DeptOccupancy.objects.create(dept=dept, date=day, on_vacation=1)
+        PayrollExport.objects.create(created_by=self.admin)
+        for staff in employees:
+            add_vacation(staff, week=i, approved_by=manager)
+            Overtime.objects.create(
+                name=staff, dept=dept, date=day, ot_hours=2, approved_by=manager
+            )
+            SickDays.objects.create(
+                name=staff, dept=dept, date=day, total_hours_away=8, approved_by=manager
+            )
+            LeaveOfAbsense.objects.create(
+                name=staff,
+                date=day,
+                start_date=day,
+                end_date=day,
+                total_hours_away=8,
+                unpaid=False,
+                approved_by=manager,
+            )
+
+    def page_queries(self, model):
+        counts = []
+        for page in ["changelist", "change"]:
+            args = []
+            if page == "change":
+                args = [model.objects.order_by("-pk").first().pk]
+            url = reverse(
+                f"admin:employee_time_management_{model._meta.model_name}_{page}",
+                args=args,
+            )
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEquals(response.status_code, 200)
+            counts.append(
+                len(
+                    [
+                        q
+                        for q in queries
+                        if not q["sql"].startswith(("SAVEPOINT", "RELEASE"))
+                    ]
+                )
+            )
+        return tuple(counts)
+
+    def test_query_budgets(self):
+        self.client.force_login(self.admin)
+        # The first load of each model's pages fills Django's content type cache.
+        for model in self.BUDGETS:
+            self.page_queries(model)
+        few = {model: self.page_queries(model) for model in self.BUDGETS}
+        for _ in range(5):
+            self.add_rows()
+        many = {model: self.page_queries(model) for model in self.BUDGETS}
+        self.assertEquals(many, few)
+        self.assertEquals(many, self.BUDGETS)
+
+
+class StaffImportTest(TestCase):
+    def setUp(self):
+        div = Division.objects.create(name="Widget, Inc.")
+        self.dept = Dept.objects.create(name="Shipping", division=div)
+        self.title = JobTitle.objects.create(title="Packer")
+        get_user_model().objects.create(username="taken")
+        self.today = datetime.date.today()
+
+    def run_import(self, lines, *args):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as file:
+            file.write("\n".join(lines) + "\n")
+        self.addCleanup(os.remove, file.name)
+        out, err = io.StringIO(), io.StringIO()
+        call_command("import_staff", file.name, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import(self):
+        header = "username,email,first_name,last_name,dept,job_title,anniversary_date"
+        rows = [
+            f"emp{i},emp{i}@gmail.com,Emp,{i},Shipping,Packer,2020-03-0{i % 9 + 1}"
+            for i in range(45)
+        ]
+        bad = [
+            "taken,taken@gmail.com,A,B,Shipping,Packer,",
+            "emp1,again@gmail.com,A,B,Shipping,Packer,",
+            "new1,new1@gmail.com,A,B,Receiving,Packer,",
+            "new2,not-an-email,A,B,Shipping,Driver,2020-02-30",
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            out, err = self.run_import([header, *rows, *bad], "--chunk-size", "20")
+        self.assertIn("Imported 45 staff, skipped 4 rows with errors.", out)
+        self.assertEquals(
+            err.splitlines(),
+            [
+                "Line 47: username 'taken' is already taken",
+                "Line 48: username 'emp1' is already taken",
+                "Line 49: unknown department 'Receiving'",
+                "Line 50: unknown job title 'Driver'; anniversary_date must be in "
+                + "YYYY-MM-DD format; email: Enter a valid email address.",
+            ],
+        )
+        # The departments and job titles, then a username check and two inserts
+        # for each of the three chunks.
+        statements = [
+            q["sql"].split()[0]
+            for q in queries
+            if not q["sql"].startswith(("SAVEPOINT", "RELEASE"))
+        ]
+        self.assertEquals(len(statements), 2 + 3 * 3)
+
+        staff = Staff.objects.select_related("user").get(user__username="emp3")
+        self.assertEquals(
+            (staff.dept, staff.job_title, staff.anniversary_date, staff.is_employee),
+            (self.dept, self.title, datetime.date(2020, 3, 4), True),
+        )
+        self.assertEquals(
+            staff.update_on, next_update_on(staff.anniversary_date, self.today)
+        )
+        self.assertFalse(staff.user.has_usable_password())
+        self.assertEquals(staff.user.get_full_name(), "Emp 3")
+
+    def test_dry_run(self):
+        out, _ = self.run_import(
+            [
+                "username,email,first_name,last_name,dept,job_title",
+                "al,al@gmail.com,Al,Jones,Shipping,Packer",
+            ],
+            "--dry-run",
+        )
+        self.assertIn("Would import 1 staff", out)
+        self.assertFalse(Staff.objects.exists())
+
+    def test_missing_columns(self):
+        with self.assertRaisesMessage(
+            CommandError, "Missing columns: dept, job_title."
+        ):
+            self.run_import(
+                ["username,email,first_name,last_name", "al,al@gmail.com,Al,Jones"]
+            )
@@ -2,11 +2,22 @@ from django.urls import path
 
 from . import views
 
-
 urlpatterns = [
     path("", views.HomePageView.as_view(), name="home"),
     path("employee/", views.employee_info_view, name="employee"),
     path("hrinfo/", views.hr_info_view, name="hrinfo"),
+    path("hrinfo/payroll/", views.payroll_export_view, name="payroll_export"),
+    path(
+        "hrinfo/payroll/<int:export_id>/csv/",
+        views.payroll_csv_view,
+        name="payroll_csv",
+    ),
+    path(
+        "hrinfo/payroll/<int:export_id>/confirm/",
+        views.payroll_confirm_view,
+        name="payroll_confirm",
+    ),
+    path("export/<str:kind>/", views.history_export_view, name="history_export"),
     path("timeoff/", views.time_off_request_view, name="timeoff"),
     path("overtime/", views.overtime_request_view, name="overtime"),
     path(
@@ -19,4 +30,7 @@ urlpatterns = [
     ),
     path("sickdays/", views.manager_sick_days_view, name="sickdays"),
     path("deptstats/", views.deptstats_view, name="deptstats"),
+    path("calendar/<str:token>.ics", views.dept_calendar_view, name="dept_calendar"),
+    path("api/balance/", views.api_balance_view, name="api_balance"),
+    path("api/<str:kind>/", views.api_requests_view, name="api_requests"),
 ]
@@ -1,42 +1,197 @@
+import base64
 import datetime
-from .models import Allowed_vacation
+import time
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import accumulate
+from django.db import connection, transaction
+from django.db.models import (
+    Case,
+    Count,
+    Exists,
+    F,
+    FloatField,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .models import (
+    Allowed_vacation,
+    Dept,
+    DeptOccupancy,
+    Holiday,
+    Overtime,
+    PayrollExport,
+    PayrollExportLine,
+    RequestStatus,
+    SickDays,
+    Staff,
+    Vacations,
+)
+from .calendar import touch_dept_calendars
+from .notices import queue_decisions
+from .postgres import DateRange
+
+# Compiled holiday calendar: {division_id: sorted weekday holiday dates}, with
+# None holding the company-wide holidays. Rebuilt when a Holiday is saved or
+# deleted in this process, and at most HOLIDAY_CACHE_SECONDS after a change
+# made by another process. Each worker process keeps its own copy, so after a
+# change the other workers go on charging the old holidays for up to
+# HOLIDAY_CACHE_SECONDS. The copy also outlives a rolled-back transaction,
+# which is why the tests clear it around every test.
+HOLIDAY_CACHE_SECONDS = 300
+_holiday_calendar = {}
+_holiday_calendar_built = None
+
+
+def clear_holiday_calendar():
+    global _holiday_calendar_built
+    _holiday_calendar_built = None
+
+
+def holiday_calendar(division_id=None):
+    """
+    Returns the sorted weekday holidays that apply to a division.
+
+    All holidays are loaded with one query and compiled into a sorted list of dates per division, which
+    is kept in memory so that hours calculations can skip holidays without querying the database each
+    time. Holidays that fall on a weekend are left out, since weekends are never charged.
+
+    Parameters:
+    - division_id: The id of the division, or None for company-wide holidays only.
+
+    Returns:
+    - A sorted list of the company-wide holidays plus the division's own holidays.
+    """
+
+    global _holiday_calendar, _holiday_calendar_built
+    now = time.monotonic()
+    if (
+        _holiday_calendar_built is None
+        or now - _holiday_calendar_built > HOLIDAY_CACHE_SECONDS
+    ):
+        company = set()
+        divisions = {}
+        for date, holiday_division in Holiday.objects.values_list(
+            "date", "division_id"
+        ):
+            if date.weekday() > 4:
+                continue
+            if holiday_division is None:
+                company.add(date)
+            else:
+                divisions.setdefault(holiday_division, set()).add(date)
+        calendar = {None: sorted(company)}
+        for holiday_division, dates in divisions.items():
+            calendar[holiday_division] = sorted(company | dates)
+        _holiday_calendar = calendar
+        _holiday_calendar_built = now
+    return _holiday_calendar.get(division_id, _holiday_calendar[None])
+
+
+def holidays_between(start_date, end_date, division_id=None):
+    """
+    Counts the weekday holidays from one date to another, inclusive.
+
+    Parameters:
+    - start_date: The first day of the range.
+    - end_date: The last day of the range.
+    - division_id: The id of the division whose holidays apply, or None for company-wide holidays only.
+
+    Returns:
+    - The number of holidays falling on a weekday in the range.
+    """
+
+    if end_date < start_date:
+        return 0
+    calendar = holiday_calendar(division_id)
+    return bisect_right(calendar, end_date) - bisect_left(calendar, start_date)
+
+
+def weekdays_between(start_date, end_date):
+    """
+    Counts the working days (Monday to Friday) from one date to another, inclusive.
 
+    The count is worked out arithmetically rather than by walking the range: every full week contributes
+    five weekdays, and at most six leftover days are checked individually, so long ranges cost the same
+    as short ones.
 
-def vacation_days_used(start_date, end_date):
+    Parameters:
+    - start_date: The first day of the range.
+    - end_date: The last day of the range.
+
+    Returns:
+    - The number of weekdays in the range, or 0 if the end date is before the start date.
+    """
+
+    if end_date < start_date:
+        return 0
+    full_weeks, extra_days = divmod((end_date - start_date).days + 1, 7)
+    first_weekday = start_date.weekday()
+    extra_weekdays = sum(1 for i in range(extra_days) if (first_weekday + i) % 7 <= 4)
+    return full_weeks * 5 + extra_weekdays
+
+
+def vacation_days_used(start_date, end_date, division_id=None):
     """
     Calculates the total vacation hours used between two dates.
 
-    This function determines the number of working days (Monday to Friday) between the given start
+    This function determines the number of working days (Monday to Friday, excluding holidays) between the given start
     and end dates and returns the total number of vacation hours used. Each working day counts as 8 hours.
 
     The function performs the following tasks:
-    - If the start and end dates are the same, it returns 8 hours.
-    - Calculates the total number of days between the start and end dates.
-    - Filters out weekends (Saturday and Sunday) to count only working days.
+    - If the start and end dates are the same, it returns 8 hours, or 0 hours if the day is a holiday.
+    - Counts the working days in the range with `weekdays_between`, which skips weekends without
+      building a list of the days.
+    - Subtracts the company-wide holidays, and the division's holidays if a division is given.
     - Multiplies the number of working days by 8 to return the total vacation hours.
 
     Parameters:
     - start_date: The start date of the vacation.
     - end_date: The end date of the vacation.
+    - division_id: The id of the employee's division, used to pick up division holidays.
 
     Returns:
     - The total number of vacation hours used, with each working day counting as 8 hours.
     """
 
     if start_date == end_date:
-        return 8
+        return 8 - holidays_between(start_date, end_date, division_id) * 8
+
+    working_days = weekdays_between(start_date, end_date) - holidays_between(
+        start_date, end_date, division_id
+    )
+    return working_days * 8
+
 
-    delta = end_date - start_date
-    days_off = []
-    for i in range(delta.days + 1):
-        days_off.append(start_date + datetime.timedelta(days=i))
+def vacation_days_used_batch(start_dates, end_dates, division_id=None):
+    """
+    Calculates the vacation hours used for many date ranges at once.
+
+    This is the batch form of `vacation_days_used`, for reports and imports that need the hours for a
+    large number of vacations. The start and end dates are paired up in order, in the same way as
+    NumPy's `busday_count`.
 
-    holidays = []
-    for days in days_off:
-        if days.weekday() <= 4:
-            holidays.append(days)
+    Parameters:
+    - start_dates: A sequence of vacation start dates.
+    - end_dates: A sequence of vacation end dates, the same length as `start_dates`.
+    - division_id: The id of the division whose holidays apply, or None for company-wide holidays only.
 
-    return len(holidays) * 8
+    Returns:
+    - A list with the vacation hours used for each pair of dates, in the same order.
+    """
+
+    if len(start_dates) != len(end_dates):
+        raise ValueError("start_dates and end_dates must be the same length.")
+    return [
+        vacation_days_used(start_date, end_date, division_id)
+        for start_date, end_date in zip(start_dates, end_dates)
+    ]
 
 
 def valid_date_range(start_date, end_date):
@@ -68,6 +223,53 @@ def valid_date_range(start_date, end_date):
     return True
 
 
+# Vacation tiers sorted by years employed, as two parallel lists for bisect.
+# Cleared when an Allowed_vacation is saved or deleted in this process, and
+# reloaded at most VACATION_TIER_CACHE_SECONDS after a change made elsewhere.
+# As with the holiday calendar, every worker process has its own copy and may
+# use the old tiers for up to VACATION_TIER_CACHE_SECONDS after another process
+# changes them.
+VACATION_TIER_CACHE_SECONDS = 300
+_vacation_tiers = ([], [])
+_vacation_tiers_loaded = None
+
+
+def clear_vacation_tiers():
+    global _vacation_tiers_loaded
+    _vacation_tiers_loaded = None
+
+
+def vacation_tiers():
+    """
+    Returns the vacation allowance tiers, loading them from the database when needed.
+
+    Returns:
+    - A tuple of two lists: the years employed for each tier in ascending order, and the annual
+      vacation hours for the matching tier.
+    """
+
+    global _vacation_tiers, _vacation_tiers_loaded
+    now = time.monotonic()
+    if (
+        _vacation_tiers_loaded is None
+        or now - _vacation_tiers_loaded > VACATION_TIER_CACHE_SECONDS
+    ):
+        tiers = Allowed_vacation.objects.order_by("years_employed").values_list(
+            "years_employed", "annual_vacation_hours"
+        )
+        _vacation_tiers = ([t[0] for t in tiers], [t[1] for t in tiers])
+        _vacation_tiers_loaded = now
+    return _vacation_tiers
+
+
+def vacation_hours_for(anniversary_date, today):
+    # Hours for the highest tier whose years employed have been reached.
+    years, hours = vacation_tiers()
+    vacation_qualify = int((today - anniversary_date).days / 365)
+    tier = bisect_right(years, vacation_qualify)
+    return hours[tier - 1] if tier else 0
+
+
 def annual_vacation(user):
     """
     Calculates the annual vacation hours a user is entitled to based on their years of employment.
@@ -78,7 +280,8 @@ def annual_vacation(user):
 
     The function performs the following tasks:
     - Calculates the number of years the user has been employed by comparing today's date with their anniversary date.
-    - Iterates through all available vacation allowances and determines the maximum vacation hours the user qualifies for based on their years of service.
+    - Looks up the highest vacation allowance the user qualifies for with a binary search over the allowance tiers,
+      which are loaded once and kept in memory until an allowance is changed.
 
     Parameters:
     - user: The user for whom the vacation hours are being calculated.
@@ -87,15 +290,29 @@ def annual_vacation(user):
     - The number of vacation hours the user is entitled to for the current year.
     """
 
-    vacations = Allowed_vacation.objects.all()
+    return vacation_hours_for(user.anniversary_date, datetime.date.today())
+
+
+def annual_vacations(staff):
+    """
+    Calculates the annual vacation hours for every staff member in a queryset.
+
+    This is the bulk form of `annual_vacation`, for reports that need the entitlement of many employees. The anniversary
+    dates are read with a single query and each one is matched against the cached allowance tiers.
+
+    Parameters:
+    - staff: A queryset of Staff.
+
+    Returns:
+    - A dict mapping each staff member's id to the number of vacation hours they are entitled to for the current year.
+      Staff without an anniversary date are entitled to 0 hours.
+    """
+
     today = datetime.date.today()
-    anniversary_date = user.anniversary_date
-    vacation_qualify = int((today - anniversary_date).days / 365)
-    allowed_hours = 0
-    for vacation in vacations:
-        if vacation_qualify >= vacation.years_employed:
-            allowed_hours = vacation.annual_vacation_hours
-    return allowed_hours
+    return {
+        staff_id: vacation_hours_for(anniversary_date, today) if anniversary_date else 0
+        for staff_id, anniversary_date in staff.values_list("pk", "anniversary_date")
+    }
 
 
 def calculate_overtime_hours(hours):
@@ -126,69 +343,81 @@ def calculate_overtime_hours(hours):
     return ot_hours
 
 
-def vacation_conflict(start, end, vacations, max_staff_off):
+def list_of_conflicing_dates(requested_vacations, approved_vacations, max_staff_off):
     """
-    Checks for conflicts in vacation requests based on maximum allowable staff off.
+    Identifies conflicting dates between requested and approved vacations.
+
+    This function checks each requested vacation against the list of approved vacations to determine if there are any conflicts,
+    based on the maximum number of staff allowed to be off on the same day. It identifies any dates during the requested vacation period
+    where the number of approved vacations would exceed the limit of staff off.
 
-    This function determines if there are any date conflicts in vacation requests by checking the number of employees
-    scheduled to be off during a given period. It compares the requested vacation dates against existing vacation dates
-    to see if the number of staff off on any day exceeds the maximum allowable staff off for the department.
+    Rather than comparing every requested vacation with every approved vacation day by day, the approved vacations are read once
+    into a difference array covering the requested period. A running sum over that array gives the number of staff off on each day,
+    and every requested vacation is then answered from those daily totals.
 
     The function performs the following tasks:
-    - Iterates over the range of days in the requested vacation period and initializes a count for each day.
-    - Iterates over the existing vacations and increments the count for each day an employee is already scheduled off.
-    - Identifies and returns a list of dates where the number of staff off exceeds the allowable limit.
+    - Works out the earliest start and latest end date of all the requested vacations.
+    - For each approved vacation overlapping that period, adds one on its first day and removes one after its last day.
+    - Adds up the differences to get the number of staff off on each day of the period.
+    - Collects, for each requested vacation, the dates where the number of staff off reaches the limit.
 
     Parameters:
-    - start: The start date of the requested vacation.
-    - end: The end date of the requested vacation.
-    - vacations: A queryset of existing vacation requests.
+    - requested_vacations: A queryset of vacation requests awaiting approval.
+    - approved_vacations: A queryset of already approved vacation requests.
     - max_staff_off: The maximum number of staff allowed to be off on any given day.
 
     Returns:
-    - A list of dates where the number of vacation requests exceeds the maximum allowable staff off.
+    - A list of tuples, where each tuple contains a requested vacation and a list of conflicting dates.
     """
 
-    start = start
-    end = end
-
-    delta = end - start
-    dict1 = {}
-    for i in range(delta.days + 1):
-        day = start + datetime.timedelta(days=i)
-        dict1[day] = 0
-
-    for vacation in vacations:
-        start = vacation.start_date
-        end = vacation.end_date
-        delta = end - start
-
-        list1 = []
-        for i in range(delta.days + 1):
-            day = start + datetime.timedelta(days=i)
-            list1.append(day)
+    requested_vacations = list(requested_vacations)
+    if len(requested_vacations) == 0:
+        return []
 
-        for item in list1:
-            if item in dict1:
-                dict1[item] += 1
+    first_day = min(vacation.start_date for vacation in requested_vacations)
+    last_day = max(vacation.end_date for vacation in requested_vacations)
+    if last_day < first_day:
+        return [(vacation, []) for vacation in requested_vacations]
+
+    staff_off = [0] * ((last_day - first_day).days + 2)
+    for vacation in approved_vacations:
+        start = max(vacation.start_date, first_day)
+        end = min(vacation.end_date, last_day)
+        if start > end:
+            continue
+        staff_off[(start - first_day).days] += 1
+        staff_off[(end - first_day).days + 1] -= 1
+    staff_off = list(accumulate(staff_off))
 
-    conflicts = [k for k, v in dict1.items() if int(v) >= max_staff_off]
+    request_with_conflicts = []
+    for requested_vacation in requested_vacations:
+        start = (requested_vacation.start_date - first_day).days
+        end = (requested_vacation.end_date - first_day).days
+        conflicts = [
+            first_day + datetime.timedelta(days=i)
+            for i in range(start, end + 1)
+            if staff_off[i] >= max_staff_off
+        ]
+        request_with_conflicts.append((requested_vacation, conflicts))
 
-    return conflicts
+    return request_with_conflicts
 
 
-def list_of_conflicing_dates(requested_vacations, approved_vacations, max_staff_off):
+def conflicting_dates_in_db(requested_vacations, approved_vacations, max_staff_off):
     """
-    Identifies conflicting dates between requested and approved vacations.
+    Identifies conflicting dates between requested and approved vacations inside the database.
 
-    This function checks each requested vacation against the list of approved vacations to determine if there are any conflicts,
-    based on the maximum number of staff allowed to be off on the same day. It identifies any dates during the requested vacation period
-    where the number of approved vacations would exceed the limit of staff off.
+    On PostgreSQL this function does the same work as `list_of_conflicing_dates` in a single SQL query, so
+    the approved vacations never have to be loaded into Python. Each requested vacation is expanded into
+    its days with `generate_series`, the days are joined against the approved vacations that cover them,
+    and only the days where the number of staff off reaches the limit are returned. On other databases
+    (such as SQLite, used by the tests) it falls back to `list_of_conflicing_dates`.
 
     The function performs the following tasks:
-    - Iterates over each requested vacation.
-    - Uses the `vacation_conflict` function to compare the requested vacation dates with the approved vacations.
-    - Collects a list of dates where conflicts occur and associates them with the respective vacation request.
+    - Expands every requested vacation into one row per day.
+    - Counts the approved vacations covering each of those days.
+    - Keeps the days where the count is at or above `max_staff_off`.
+    - Groups the conflicting days by requested vacation, in date order.
 
     Parameters:
     - requested_vacations: A queryset of vacation requests awaiting approval.
@@ -199,19 +428,51 @@ def list_of_conflicing_dates(requested_vacations, approved_vacations, max_staff_
     - A list of tuples, where each tuple contains a requested vacation and a list of conflicting dates.
     """
 
-    request_with_conflicts = []
+    if connection.vendor != "postgresql":
+        return list_of_conflicing_dates(
+            requested_vacations, approved_vacations, max_staff_off
+        )
+
+    requested_vacations = list(requested_vacations)
     if len(requested_vacations) == 0:
         return []
 
-    for requested_vacation in requested_vacations:
-        vacation = requested_vacation
-        start = vacation.start_date
-        end = vacation.end_date
+    approved_sql, approved_params = (
+        approved_vacations.order_by()
+        .values("start_date", "end_date")
+        .query.sql_with_params()
+    )
+    sql = f"""
+        SELECT requested.id, series.day::date
+        FROM {Vacations._meta.db_table} AS requested
+        CROSS JOIN LATERAL generate_series(
+            requested.start_date::timestamp,
+            requested.end_date::timestamp,
+            interval '1 day'
+        ) AS series(day)
+        LEFT JOIN ({approved_sql}) AS approved
+            ON approved.start_date <= series.day::date
+            AND approved.end_date >= series.day::date
+        WHERE requested.id = ANY(%s)
+        GROUP BY requested.id, series.day
+        HAVING COUNT(approved.start_date) >= %s
+        ORDER BY requested.id, series.day
+    """
+    params = (
+        *approved_params,
+        [vacation.pk for vacation in requested_vacations],
+        max_staff_off,
+    )
 
-        conflicts = vacation_conflict(start, end, approved_vacations, max_staff_off)
-        request_with_conflicts.append((requested_vacation, conflicts))
+    conflicts = {}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for vacation_id, day in cursor.fetchall():
+            conflicts.setdefault(vacation_id, []).append(day)
 
-    return request_with_conflicts
+    return [
+        (vacation, conflicts.get(vacation.pk, [])) for vacation in requested_vacations
+    ]
 
 
 def only_apply_for_one_vacation_date(start, end, vacations):
@@ -222,10 +483,9 @@ def only_apply_for_one_vacation_date(start, end, vacations):
     It compares the requested vacation dates against existing vacations to see if there is overlap, preventing the employee
     from applying for multiple vacations on the same date.
 
-    The function performs the following tasks:
-    - Iterates over the range of days in the requested vacation period and initializes a count for each day.
-    - Iterates over the employee's existing vacation dates and increments the count for any overlapping days.
-    - Returns True if the employee has already applied for a vacation on any date within the requested period.
+    The check is a single `EXISTS` query: an existing vacation overlaps the requested period when it starts on or before
+    the requested end date and ends on or after the requested start date. On PostgreSQL the same test is written as a
+    date range overlap, so it is answered from the GiST index behind the vacation overlap constraint.
 
     Parameters:
     - start: The start date of the requested vacation.
@@ -237,48 +497,41 @@ def only_apply_for_one_vacation_date(start, end, vacations):
     - False if there are no conflicts with existing vacation requests.
     """
 
-    start = start
-    end = end
-
-    delta = end - start
-    dict1 = {}
-    for i in range(delta.days + 1):
-        day = start + datetime.timedelta(days=i)
-        dict1[day] = 0
-
-    for vacation in vacations:
-        start1 = vacation.start_date
-        end1 = vacation.end_date
-        delta = end1 - start1
-
-        list1 = []
-        for i in range(delta.days + 1):
-            day = start1 + datetime.timedelta(days=i)
-            list1.append(day)
+    if connection.vendor == "postgresql":
+        return (
+            vacations.annotate(dates=DateRange("start_date", "end_date"))
+            .filter(dates__overlap=DateRange(Value(start), Value(end)))
+            .exists()
+        )
 
-        for item in list1:
-            if item in dict1:
-                dict1[item] += 1
-
-    return 1 in dict1.values()
+    return vacations.filter(start_date__lte=end, end_date__gte=start).exists()
 
 
 def add_year(date):
+    if date.month == 2 and date.day == 29:
+        return date.replace(year=date.year + 1, day=28)
     return date.replace(year=date.year + 1)
 
 
+def next_update_on(update_on, date):
+    # The first anniversary of update_on that falls after date.
+    while update_on <= date:
+        update_on = add_year(update_on)
+    return update_on
+
+
 def update_vacations(staff, date):
     """
     Updates the vacation hours for staff based on the anniversary date.
 
     This function checks if a staff member's vacation hours need to be reset based on their annual update date.
     If the current date matches or exceeds the staff member's `update_on` date, the vacation usage is reset for the new year,
-    and the staff member's `update_on` date is incremented by one year.
+    and the staff member's `update_on` date is moved on to their next anniversary.
 
     The function performs the following tasks:
-    - If the current date is on or after the `update_on` date and vacation hours have already been updated, it marks `updated_hours` as False.
-    - If the current date is on or after the `update_on` date and vacation hours have not yet been updated, it increments the `update_on` date by one year,
-      resets the vacation usage to zero, and marks `updated_hours` as True.
+    - If the current date is on or after the `update_on` date, it moves the `update_on` date forward a year at a time until
+      it is in the future, resets the vacation usage to zero, and marks `updated_hours` as True.
+    - Saves only the changed fields, in a single update.
 
     Parameters:
     - staff: The staff member whose vacation hours are being updated.
@@ -288,15 +541,680 @@ def update_vacations(staff, date):
     - None. The function updates the staff member's record in the database directly.
     """
 
-    if date >= staff.update_on and staff.updated_hours == True:
-        staff.updated_hours = False
-        staff.save()
-
-    if date >= staff.update_on and staff.updated_hours == False:
-        staff.update_on = add_year(staff.update_on)
-        staff.save()
+    if date >= staff.update_on:
+        staff.update_on = next_update_on(staff.update_on, date)
         staff.vacation_used = 0
-        staff.save()
-        staff.updated_hours == True
-        staff.save()
+        staff.updated_hours = True
+        Staff.objects.filter(pk=staff.pk).update(
+            update_on=staff.update_on,
+            vacation_used=0,
+            updated_hours=True,
+            **staff_version_bump(),
+        )
     return
+
+
+def roll_vacation_years(date, chunk_size=500):
+    """
+    Rolls every staff member whose vacation year has ended over to their next vacation year.
+
+    This is the bulk form of `update_vacations`. Staff who are due (whose `update_on` date is on or before the given date)
+    are found with an indexed query and updated in chunks. Each chunk is locked, rolled over and written back with a
+    single bulk `UPDATE` inside its own transaction. Rolled staff have an `update_on` date in the future, so running the
+    rollover again on the same date changes nothing.
+
+    Parameters:
+    - date: The current date, used to check which staff are due.
+    - chunk_size: The number of staff updated per transaction.
+
+    Returns:
+    - The number of staff rolled over.
+    """
+
+    due = Staff.objects.filter(update_on__lte=date).order_by("pk")
+    rolled = 0
+    while True:
+        with transaction.atomic():
+            chunk = list(due.select_for_update().only("pk", "update_on")[:chunk_size])
+            if not chunk:
+                return rolled
+            bump = staff_version_bump()
+            for staff in chunk:
+                staff.update_on = next_update_on(staff.update_on, date)
+                staff.vacation_used = 0
+                staff.updated_hours = True
+                staff.version = bump["version"]
+                staff.modified_at = bump["modified_at"]
+            Staff.objects.bulk_update(
+                chunk,
+                [
+                    "update_on",
+                    "vacation_used",
+                    "updated_hours",
+                    "version",
+                    "modified_at",
+                ],
+            )
+        rolled += len(chunk)
+
+
+def staff_attendance(date):
+    """
+    Annotates every staff member with their attendance status for a given date.
+
+    This function builds a single queryset over all staff that works out whether each employee is on an
+    approved vacation, away sick, or present on the given date. The status is computed in the database with
+    `EXISTS` subqueries so the whole company is resolved in one query, instead of one vacation and one sick
+    day lookup per employee.
+
+    The function performs the following tasks:
+    - Selects the related user, job title and department so rendering a staff member needs no extra queries.
+    - Marks a staff member as "Vacation" if an approved vacation covers the date.
+    - Otherwise marks them as "Sick" if a sick day is recorded on the date.
+    - Otherwise marks them as "Present".
+
+    Parameters:
+    - date: The date to check attendance for.
+
+    Returns:
+    - A queryset of Staff, each with an `attendance` attribute of "Vacation", "Sick" or "Present".
+    """
+
+    on_vacation = Vacations.objects.filter(
+        name=OuterRef("pk"),
+        status=RequestStatus.APPROVED,
+        start_date__lte=date,
+        end_date__gte=date,
+    )
+    off_sick = SickDays.objects.filter(name=OuterRef("pk"), date=date)
+
+    return Staff.objects.select_related("user", "job_title", "dept").annotate(
+        attendance=Case(
+            When(Exists(on_vacation), then=Value("Vacation")),
+            When(Exists(off_sick), then=Value("Sick")),
+            default=Value("Present"),
+        )
+    )
+
+
+def staff_sick_days(staff, start_date=None, end_date=None):
+    """
+    Annotates a staff queryset with the number of sick days each employee has taken.
+
+    This function adds a `sick_days` count to every staff member in a single aggregated query, so reports
+    that show sick time for the whole company do not need to count sick days one employee at a time.
+    The count can be limited to a date window (for example, the current year) to keep totals meaningful.
+
+    The function performs the following tasks:
+    - Selects the related user so first and last names can be read without extra queries.
+    - Counts the sick days recorded for each staff member, optionally only between the given dates.
+
+    Parameters:
+    - staff: A queryset of Staff to annotate.
+    - start_date: Optional first date of the window. If omitted, the window is open at the start.
+    - end_date: Optional last date of the window. If omitted, the window is open at the end.
+
+    Returns:
+    - The queryset with a `sick_days` attribute on each staff member.
+    """
+
+    window = Q()
+    if start_date is not None:
+        window &= Q(sickdays__date__gte=start_date)
+    if end_date is not None:
+        window &= Q(sickdays__date__lte=end_date)
+
+    return staff.select_related("user").annotate(
+        sick_days=Count("sickdays", filter=window)
+    )
+
+
+def _count_per_dept(queryset):
+    # Correlated COUNT(*) over rows of the outer department, 0 when there are none.
+    counts = (
+        queryset.filter(dept=OuterRef("pk"))
+        .order_by()
+        .values("dept")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def update_occupancy(dept_id, start_date, end_date, on_vacation=0, off_sick=0):
+    """
+    Adjusts the department occupancy table for every day in a date range.
+
+    This function keeps the `DeptOccupancy` table in step with approved vacations and recorded sick days,
+    so the number of staff off in a department on a given day can be read with a single indexed lookup
+    instead of being rebuilt from the raw vacation and sick day rows. It is called by the `Vacations` and
+    `SickDays` signal receivers in signals.py, in the same transaction as the change it records.
+
+    The function performs the following tasks:
+    - Creates any missing occupancy rows for the department in the date range, when staff are added.
+    - Adds the given deltas to the vacation and sick counts of every row in the range in one update.
+
+    Parameters:
+    - dept_id: The id of the department whose occupancy changes. Nothing is recorded if this is None.
+    - start_date: The first day of the change.
+    - end_date: The last day of the change.
+    - on_vacation: The change in the number of staff on vacation (for example 1 when a vacation is approved).
+    - off_sick: The change in the number of staff away sick.
+
+    Returns:
+    - None. The occupancy table is updated directly.
+    """
+
+    if dept_id is None:
+        return
+
+    days = [
+        start_date + datetime.timedelta(days=i)
+        for i in range((end_date - start_date).days + 1)
+    ]
+    with transaction.atomic():
+        # Removals only touch existing rows. A department being deleted has already
+        # lost its rows, and recreating them would leave them pointing at nothing.
+        if on_vacation > 0 or off_sick > 0:
+            DeptOccupancy.objects.bulk_create(
+                [DeptOccupancy(dept_id=dept_id, date=day) for day in days],
+                ignore_conflicts=True,
+            )
+        DeptOccupancy.objects.filter(
+            dept_id=dept_id, date__gte=start_date, date__lte=end_date
+        ).update(
+            on_vacation=F("on_vacation") + on_vacation,
+            off_sick=F("off_sick") + off_sick,
+        )
+
+
+def rebuild_occupancy(depts=None):
+    """
+    Rebuilds the department occupancy table from the vacation and sick day history.
+
+    This function throws away the current `DeptOccupancy` rows and recounts them from every approved
+    vacation and every recorded sick day. It is used to fill the table for the first time, and after rows
+    have been written with `bulk_create` or a queryset `update()`, which skip the signal receivers that
+    keep the table up to date.
+
+    The function performs the following tasks:
+    - Counts, for each department and day, the approved vacations covering that day.
+    - Counts, for each department and day, the sick days recorded on that day.
+    - Replaces the contents of the occupancy table with these counts in one transaction.
+
+    Parameters:
+    - depts: The departments to rebuild, as a list or a queryset, or None for every department.
+
+    Returns:
+    - The number of occupancy rows written.
+    """
+
+    approved = Vacations.objects.filter(
+        status=RequestStatus.APPROVED, dept__isnull=False
+    )
+    sick_days = SickDays.objects.filter(dept__isnull=False)
+    occupancy = DeptOccupancy.objects.all()
+    if depts is not None:
+        approved = approved.filter(dept__in=depts)
+        sick_days = sick_days.filter(dept__in=depts)
+        occupancy = occupancy.filter(dept__in=depts)
+
+    vacations = Counter()
+    for dept_id, start_date, end_date in approved.values_list(
+        "dept_id", "start_date", "end_date"
+    ).iterator():
+        for i in range((end_date - start_date).days + 1):
+            vacations[dept_id, start_date + datetime.timedelta(days=i)] += 1
+
+    sick = Counter(sick_days.values_list("dept_id", "date").iterator())
+
+    rows = [
+        DeptOccupancy(
+            dept_id=dept_id,
+            date=date,
+            on_vacation=vacations[dept_id, date],
+            off_sick=sick[dept_id, date],
+        )
+        for dept_id, date in vacations.keys() | sick.keys()
+    ]
+    with transaction.atomic():
+        occupancy.delete()
+        DeptOccupancy.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def dept_staffing(date):
+    """
+    Annotates every department with its staffing figures for a given date.
+
+    This function works out, for all departments at once, how many employees they have, how many are on
+    an approved vacation, how many are away sick and how many are present, and flags departments where
+    the present staff is below the department's minimum. The vacation and sick counts are read from the
+    `DeptOccupancy` table, and everything is computed by the database in a single query, so the cost does
+    not grow with the number of departments.
+
+    The function performs the following tasks:
+    - Counts the employees in each department.
+    - Looks up the number of staff on vacation and away sick in each department on the date.
+    - Subtracts vacations and sick days from the total to get the staff present.
+    - Sets `understaffed` to "Yes" if the staff present is below `min_staff`, otherwise "No".
+
+    Parameters:
+    - date: The date to calculate staffing for.
+
+    Returns:
+    - A queryset of Dept with `total_staff`, `on_vacation`, `off_sick`, `staff_present` and
+      `understaffed` attributes.
+    """
+
+    occupancy = DeptOccupancy.objects.filter(dept=OuterRef("pk"), date=date)
+    return Dept.objects.annotate(
+        total_staff=_count_per_dept(Staff.objects.filter(is_employee=True)),
+        on_vacation=Coalesce(Subquery(occupancy.values("on_vacation")[:1]), 0),
+        off_sick=Coalesce(Subquery(occupancy.values("off_sick")[:1]), 0),
+        staff_present=F("total_staff") - F("on_vacation") - F("off_sick"),
+        understaffed=Case(
+            When(staff_present__lt=F("min_staff"), then=Value("Yes")),
+            default=Value("No"),
+        ),
+    )
+
+
+def _lock_pending(model, ids, dept):
+    return list(
+        model.objects.select_for_update()
+        .filter(pk__in=ids, dept=dept, status=RequestStatus.PENDING)
+        .order_by("pk")
+    )
+
+
+def _update_staff(staff_ids, totals=None):
+    """
+    Adds amounts to staff balances and moves their versions on with one `UPDATE`.
+
+    Parameters:
+    - staff_ids: The ids of every staff member whose requests changed.
+    - totals: A dict mapping a Staff field name to a dict of {staff id: amount to add}.
+    """
+
+    totals = {field: amounts for field, amounts in (totals or {}).items() if amounts}
+    Staff.objects.filter(pk__in=set(staff_ids)).update(
+        **staff_version_bump(),
+        **{
+            field: F(field)
+            + Case(
+                *[When(pk=pk, then=Value(amount)) for pk, amount in amounts.items()],
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+            for field, amounts in totals.items()
+        },
+    )
+
+
+def _vacation_days(vacations):
+    # The number of the vacations covering each day.
+    days = Counter()
+    for vacation in vacations:
+        for i in range((vacation.end_date - vacation.start_date).days + 1):
+            days[vacation.start_date + datetime.timedelta(days=i)] += 1
+    return days
+
+
+def _add_vacation_days(dept, added):
+    # Occupancy for a batch of approved vacations: one insert for any missing days,
+    # then one update per distinct number of staff added on a day.
+    DeptOccupancy.objects.bulk_create(
+        [DeptOccupancy(dept=dept, date=day) for day in added], ignore_conflicts=True
+    )
+    days_by_count = {}
+    for day, count in added.items():
+        days_by_count.setdefault(count, []).append(day)
+    for count, days in days_by_count.items():
+        DeptOccupancy.objects.filter(dept=dept, date__in=days).update(
+            on_vacation=F("on_vacation") + count
+        )
+
+
+def approve_vacations(vacation_ids, dept, max_staff_off=None):
+    """
+    Approves a batch of pending vacation requests and charges them to the employees.
+
+    The requests are locked with `SELECT ... FOR UPDATE` for the length of the transaction, so when two managers act on
+    the same request at once the second waits and then finds it already decided. Requests that are no longer pending,
+    or are in another department, are skipped.
+
+    If `max_staff_off` is given, the department row is locked too and the batch is checked as a whole: if approving
+    every request would leave more than `max_staff_off` employees on vacation on any day, nothing is approved. Two
+    requests that are each fine on their own can still be refused together. The staff already on vacation are read
+    from the department's `DeptOccupancy` rows for the days the batch covers, in one query.
+
+    The work is done in a fixed number of statements whatever the size of the batch:
+    - The statuses are changed with one `UPDATE`.
+    - The vacation used and unpaid time are added up per employee and applied with one `UPDATE` using `F()`
+      expressions, so approvals of different requests for the same employee cannot overwrite each other.
+    - The department's occupancy is updated with one insert and one update per distinct number of staff added on a day.
+    - A notice of each decision is queued for the employee with one insert.
+
+    Parameters:
+    - vacation_ids: The ids of the vacation requests.
+    - dept: The manager's department.
+    - max_staff_off: The maximum number of staff allowed to be off on any day, or None to skip the check.
+
+    Returns:
+    - A tuple of the list of approved Vacations objects and a sorted list of the dates the batch would leave the
+      department short-staffed. If any dates are returned, no requests were approved.
+    """
+
+    with transaction.atomic():
+        if max_staff_off is not None:
+            Dept.objects.select_for_update().get(pk=dept.pk)
+        vacations = _lock_pending(Vacations, vacation_ids, dept)
+        if not vacations:
+            return [], []
+
+        added = _vacation_days(vacations)
+        if max_staff_off is not None:
+            on_vacation = dict(
+                DeptOccupancy.objects.filter(dept=dept, date__in=added).values_list(
+                    "date", "on_vacation"
+                )
+            )
+            # A day is short-staffed if the staff already on vacation and the whole
+            # batch together are more than the department can spare.
+            conflicts = sorted(
+                day
+                for day, count in added.items()
+                if on_vacation.get(day, 0) + count > max_staff_off
+            )
+            if conflicts:
+                return [], conflicts
+
+        Vacations.objects.filter(pk__in=[v.pk for v in vacations]).update(
+            status=RequestStatus.APPROVED
+        )
+        vacation_used = Counter()
+        unpaid_time = Counter()
+        for vacation in vacations:
+            vacation.status = RequestStatus.APPROVED
+            vacation_used[vacation.name_id] += vacation.total_hours_away
+            if vacation.hours_unpaid:
+                unpaid_time[vacation.name_id] += vacation.hours_unpaid
+        _update_staff(
+            [v.name_id for v in vacations],
+            {"vacation_used": vacation_used, "unpaid_time": unpaid_time},
+        )
+        _add_vacation_days(dept, added)
+        touch_dept_calendars([dept.pk])
+        queue_decisions(vacations)
+    return vacations, []
+
+
+def deny_vacations(vacation_ids, dept):
+    """
+    Denies a batch of pending vacation requests and gives back the overtime they would have used.
+
+    Like `approve_vacations`, the requests are locked for the transaction and only pending requests in the department
+    are decided, so a request is never both approved and denied. The statuses are changed with one `UPDATE`, the
+    overtime is returned per employee with one `F()` update, and a notice of each decision is queued for the employee.
+
+    Parameters:
+    - vacation_ids: The ids of the vacation requests.
+    - dept: The manager's department.
+
+    Returns:
+    - The list of denied Vacations objects.
+    """
+
+    with transaction.atomic():
+        vacations = _lock_pending(Vacations, vacation_ids, dept)
+        if not vacations:
+            return []
+        Vacations.objects.filter(pk__in=[v.pk for v in vacations]).update(
+            status=RequestStatus.DENIED
+        )
+        overtime = Counter()
+        for vacation in vacations:
+            vacation.status = RequestStatus.DENIED
+            if vacation.overtime:
+                overtime[vacation.name_id] += vacation.overtime
+        _update_staff([v.name_id for v in vacations], {"overtime_hours": overtime})
+        queue_decisions(vacations)
+    return vacations
+
+
+def approve_vacation(vacation_id, dept):
+    """
+    Approves one pending vacation request. See `approve_vacations`; the department's capacity is not checked, as the
+    manager has already been shown any short-staffed days for this request.
+
+    Returns:
+    - The approved Vacations object, or None if there was no pending request with this id in the department.
+    """
+
+    vacations, _ = approve_vacations([vacation_id], dept)
+    return vacations[0] if vacations else None
+
+
+def deny_vacation(vacation_id, dept):
+    """
+    Denies one pending vacation request. See `deny_vacations`.
+
+    Returns:
+    - The denied Vacations object, or None if there was no pending request with this id in the department.
+    """
+
+    vacations = deny_vacations([vacation_id], dept)
+    return vacations[0] if vacations else None
+
+
+def decide_overtime(overtime_ids, dept, status):
+    """
+    Approves or denies a batch of pending overtime requests.
+
+    The requests are locked for the transaction and only pending requests in the department are decided. The statuses
+    are changed with one `UPDATE`, on approval the overtime hours are added per employee with one `F()` update, and a
+    notice of each decision is queued for the employee.
+
+    Parameters:
+    - overtime_ids: The ids of the overtime requests.
+    - dept: The manager's department.
+    - status: RequestStatus.APPROVED or RequestStatus.DENIED.
+
+    Returns:
+    - The list of decided Overtime objects.
+    """
+
+    with transaction.atomic():
+        requests = _lock_pending(Overtime, overtime_ids, dept)
+        if not requests:
+            return []
+        Overtime.objects.filter(pk__in=[o.pk for o in requests]).update(status=status)
+        hours = Counter()
+        for overtime in requests:
+            overtime.status = status
+            hours[overtime.name_id] += overtime.ot_hours
+        _update_staff(
+            hours,
+            {"overtime_hours": hours} if status == RequestStatus.APPROVED else None,
+        )
+        queue_decisions(requests)
+    return requests
+
+
+def create_payroll_export(user):
+    """
+    Takes a snapshot of every employee's unpaid time for the next payroll run.
+
+    The unpaid hours of all staff who have any are read with one query and saved as the lines of a new
+    `PayrollExport`. The export can then be downloaded as a CSV and, once payroll has been processed,
+    confirmed with `confirm_payroll_export`.
+
+    Parameters:
+    - user: The HR user creating the export.
+
+    Returns:
+    - The new PayrollExport.
+    """
+
+    with transaction.atomic():
+        export = PayrollExport.objects.create(created_by=user)
+        PayrollExportLine.objects.bulk_create(
+            [
+                PayrollExportLine(export=export, staff_id=staff_id, unpaid_time=hours)
+                for staff_id, hours in Staff.objects.filter(
+                    unpaid_time__gt=0
+                ).values_list("pk", "unpaid_time")
+            ],
+            batch_size=1000,
+        )
+    return export
+
+
+def confirm_payroll_export(export):
+    """
+    Clears the unpaid time that was sent to payroll in an export.
+
+    Every exported employee's unpaid time is reduced by the hours in the export with a single `UPDATE`,
+    rather than being set to zero, so any unpaid time added after the export was taken is kept for the
+    next payroll run. The result never goes below zero. The export is marked as confirmed in the same transaction, and an export can only be
+    confirmed once.
+
+    Parameters:
+    - export: The PayrollExport to confirm.
+
+    Returns:
+    - The number of staff whose unpaid time was cleared, or None if the export had already been confirmed.
+    """
+
+    with transaction.atomic():
+        confirmed = PayrollExport.objects.filter(
+            pk=export.pk, confirmed_at__isnull=True
+        ).update(confirmed_at=timezone.now())
+        if not confirmed:
+            return None
+        exported_hours = PayrollExportLine.objects.filter(
+            export=export, staff=OuterRef("pk")
+        ).values("unpaid_time")
+        # Never below zero, in case the hours were cleared some other way since the
+        # export was taken.
+        return Staff.objects.filter(payrollexportline__export=export).update(
+            unpaid_time=Greatest(
+                F("unpaid_time") - Subquery(exported_hours), Value(0.0)
+            ),
+            **staff_version_bump(),
+        )
+
+
+def clear_unpaid_time(staff):
+    """
+    Clears one employee's unpaid time outside a payroll export.
+
+    The employee's hours are also taken off their lines in exports that have not been confirmed yet, so that
+    confirming one of those exports later does not subtract the same hours a second time and eat into unpaid time
+    added since.
+
+    Parameters:
+    - staff: The Staff member whose unpaid time is applied to the next payroll.
+    """
+
+    with transaction.atomic():
+        PayrollExportLine.objects.filter(
+            staff=staff, export__confirmed_at__isnull=True
+        ).update(unpaid_time=0)
+        staff.unpaid_time = 0
+        staff.save()
+
+
+def encode_cursor(date, pk):
+    """
+    Encodes the position of a row in a date-ordered list as an opaque cursor.
+
+    Parameters:
+    - date: The date of the last row on the current page.
+    - pk: The id of the last row on the current page, which breaks ties between rows on the same date.
+
+    Returns:
+    - A URL-safe string to pass back to `page_by_cursor` for the next page.
+    """
+
+    return base64.urlsafe_b64encode(f"{date.isoformat()}.{pk}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor made by `encode_cursor`.
+
+    Parameters:
+    - cursor: The cursor string sent by the client.
+
+    Returns:
+    - A (date, pk) tuple.
+
+    Raises:
+    - ValueError: If the cursor was not made by `encode_cursor`.
+    """
+
+    try:
+        date, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split(".")
+        return datetime.date.fromisoformat(date), int(pk)
+    except (TypeError, UnicodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def page_by_cursor(queryset, date_field, cursor=None, limit=50):
+    """
+    Returns one page of a queryset ordered newest first, starting after a cursor.
+
+    Pages are found with a keyset condition on (date, id) rather than an offset, so every page costs one indexed
+    query however deep into the list it is, and rows added while a client is paging do not shift later pages.
+
+    Parameters:
+    - queryset: The rows to page through.
+    - date_field: The name of the date field to order by, e.g. "start_date".
+    - cursor: The cursor returned with the previous page, or None for the first page.
+    - limit: The maximum number of rows on the page.
+
+    Returns:
+    - A (rows, next_cursor) tuple. next_cursor is None on the last page.
+
+    Raises:
+    - ValueError: If the cursor is invalid.
+    """
+
+    if cursor:
+        date, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f"{date_field}__lt": date}) | Q(**{date_field: date, "pk__lt": pk})
+        )
+    rows = list(queryset.order_by(f"-{date_field}", "-pk")[: limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(getattr(rows[-1], date_field), rows[-1].pk)
+
+
+# Versions that tell clients a cached copy is stale: a staff member's version and
+# modified time are the ETag and Last-Modified of their API responses. The code
+# that changes what an API response shows moves them on itself, usually in the
+# same `update()` as the change.
+def staff_version_bump():
+    """
+    Returns the `update()` arguments that move staff members' versions on.
+
+    Every change to a staff member's balances or requests includes these, so that API clients polling for changes see
+    a new ETag.
+    """
+
+    return {"version": F("version") + 1, "modified_at": timezone.now()}
+
+
+def touch_staff(staff_ids):
+    """
+    Moves the version of staff members on, for changes that were not made with `staff_version_bump()`.
+
+    Parameters:
+    - staff_ids: The ids of the staff members whose balances or requests changed, as a list or a queryset.
+    """
+
+    Staff.objects.filter(pk__in=staff_ids).update(**staff_version_bump())
@@ -155,9 +155,11 @@ LOGIN_REDIRECT_URL = "home"
 
 LOGOUT_REDIRECT_URL = "home"
 
-# EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
-# Email settings
-EMAIL_BACKEND = "anymail.backends.mailgun.EmailBackend"  # Use Anymail's Mailgun backend
+# Email settings. Set EMAIL_BACKEND to "django.core.mail.backends.console.EmailBackend"
+# to print the emails the send_outbox worker sends instead of using Mailgun.
+EMAIL_BACKEND = config(
+    "EMAIL_BACKEND", default="anymail.backends.mailgun.EmailBackend"
+)  # Use Anymail's Mailgun backend
 DEFAULT_FROM_EMAIL = config("DEFAULT_FROM_EMAIL")
 
 CRISPY_TEMPLATE_PACK = "bootstrap5"
@@ -2,6 +2,10 @@ from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin
 
+from employee_time_management.models import Staff
+from employee_time_management.calendar import touch_dept_calendars
+from employee_time_management.utils import touch_staff
+
 from .forms import CustomUserCreationForm, CustomUserChangeForm
 
 CustomUser = get_user_model()
@@ -15,5 +19,13 @@ class CustomUserAdmin(UserAdmin):
         "username",
     ]
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # The name is shown by the balance API and on the department calendar.
+        if change and {"first_name", "last_name", "username"} & set(form.changed_data):
+            staff = Staff.objects.filter(user=obj)
+            touch_staff(staff.values("pk"))
+            touch_dept_calendars(staff.values("dept_id"))
+
 
 admin.site.register(CustomUser, CustomUserAdmin)
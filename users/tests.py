@@ -1,5 +1,11 @@
 from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+import io
+
+from employee_time_management.models import Dept, Division, JobTitle, OutboxEmail, Staff
 
 
 class CustomUserTests(TestCase):
@@ -28,3 +34,41 @@ class CustomUserTests(TestCase):
         self.assertTrue(admin_user.is_active)
         self.assertTrue(admin_user.is_staff)
         self.assertTrue(admin_user.is_superuser)
+
+
+class SignupTests(TestCase):
+
+    def setUp(self):
+        division = Division.objects.create(name="Widget, Inc.")
+        self.dept = Dept.objects.create(name="Shipping", division=division)
+        self.job_title = JobTitle.objects.create(title="Clerk")
+        admin_user = get_user_model().objects.create_superuser(
+            username="hr", email="hr@email.com", password="testpass123"
+        )
+        Staff.objects.create(user=admin_user)
+        self.client.force_login(admin_user)
+
+    def test_signup_queues_email(self):
+        response = self.client.post(
+            reverse("signup"),
+            {
+                "username": "will",
+                "email": "will@email.com",
+                "first_name": "Will",
+                "last_name": "Smith",
+                "dept": self.dept.id,
+                "job_title": self.job_title.id,
+            },
+        )
+        self.assertRedirects(response, reverse("home"))
+        self.assertTrue(Staff.objects.filter(user__username="will").exists())
+        # Nothing is sent during the request; the worker sends it.
+        self.assertEqual(mail.outbox, [])
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.to, "will@email.com")
+        self.assertEqual(email.subject, "Set your password")
+
+        call_command("send_outbox", stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["will@email.com"])
+        self.assertIn("/reset/", mail.outbox[0].body)
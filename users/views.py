@@ -4,10 +4,11 @@ from .forms import UserSignupForm  # Ensure the form is imported from the users
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
 from django.urls import reverse
-from django.core.mail import send_mail
+from django.db import transaction
 from django.template.loader import render_to_string
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
+from employee_time_management.outbox import queue_email
 
 
 @user_passes_test(lambda u: u.is_staff)
@@ -15,32 +16,35 @@ def signup(request):
     if request.method == "POST":
         form = UserSignupForm(request.POST)
         if form.is_valid():
-            user = form.save()
-            # Generate token and encoded user ID for the password reset link
-            uid = urlsafe_base64_encode(force_bytes(user.pk))
-            token = default_token_generator.make_token(user)
+            with transaction.atomic():
+                user = form.save()
+                # Generate token and encoded user ID for the password reset link
+                uid = urlsafe_base64_encode(force_bytes(user.pk))
+                token = default_token_generator.make_token(user)
 
-            # Create the password reset link
-            reset_link = request.build_absolute_uri(
-                reverse(
-                    "password_reset_confirm", kwargs={"uidb64": uid, "token": token}
+                # Create the password reset link
+                reset_link = request.build_absolute_uri(
+                    reverse(
+                        "password_reset_confirm", kwargs={"uidb64": uid, "token": token}
+                    )
                 )
-            )
-            # Trigger a password reset email
-            subject = "Set your password"
-            email_template_name = "registration/password_reset_email.html"
-            context = {
-                "email": user.email,
-                "domain": request.get_host(),
-                "site_name": "Your Site",
-                "uid": uid,
-                "user": user,
-                "token": token,
-                "protocol": "http",
-                "reset_link": reset_link,
-            }
-            email_body = render_to_string(email_template_name, context)
-            send_mail(subject, email_body, "your_email@example.com", [user.email])
+                # Trigger a password reset email
+                subject = "Set your password"
+                email_template_name = "registration/password_reset_email.html"
+                context = {
+                    "email": user.email,
+                    "domain": request.get_host(),
+                    "site_name": "Your Site",
+                    "uid": uid,
+                    "user": user,
+                    "token": token,
+                    "protocol": "http",
+                    "reset_link": reset_link,
+                }
+                email_body = render_to_string(email_template_name, context)
+                # Written to the outbox in the same transaction as the user, and sent
+                # afterwards by the send_outbox worker.
+                queue_email(user.email, subject, email_body, "your_email@example.com")
             return redirect("home")  # Redirect after successful signup
     else:
         form = UserSignupForm()